@@ -0,0 +1,243 @@
+import sqlite3
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from queue import Queue
+from re import compile, IGNORECASE
+from threading import Lock, Thread
+from time import monotonic, sleep
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from models import PairData
+from utils import string_to_number, number_to_string
+
+ALERT_METRICS = {
+    "price": "price",
+    "volume": "volume",
+    "liquidity": "liquidity",
+    "mcap": "market_cap",
+    "market_cap": "market_cap",
+    "makers": "makers",
+    "5m": "five_min_change",
+    "1h": "one_hour_change",
+    "6h": "six_hour_change",
+    "24h": "twenty_four_hour_change",
+}
+
+METRIC_ATTRIBUTES = frozenset(ALERT_METRICS.values())
+
+PERCENT_METRICS = {"five_min_change", "one_hour_change", "six_hour_change", "twenty_four_hour_change"}
+
+CONDITION_PATTERN = compile(r"^\s*(?P<metric>[\w.]+)(?:\s+change)?\s*(?P<op>[<>])\s*"
+                            r"(?P<value>-?\$?(?:\d[\d,]*(?:\.\d*)?|\.\d+)[KMB%]?)\s*$", IGNORECASE)
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    """A per-chat threshold rule on one metric of one pair."""
+
+    id: int
+    chat_id: int
+    address: str
+    token: str
+    metric: str
+    op: str
+    threshold: float
+
+    def describe(self) -> str:
+        label = next(alias for alias, attribute in ALERT_METRICS.items() if attribute == self.metric)
+        value = f"{self.threshold:g}%" if self.metric in PERCENT_METRICS else number_to_string(self.threshold)
+        return f"#{self.id} {self.token} {label} {self.op} {value}"
+
+
+def parse_alert_conditions(text: str) -> List[Tuple[str, str, float]]:
+    """Parse conditions like "liquidity > 50K or 1h < -20%" into (metric attribute, operator, threshold) tuples."""
+
+    conditions = []
+    for part in text.split(" or "):
+        if not (match := CONDITION_PATTERN.match(part)):
+            raise ValueError(f"Cannot parse condition \"{part.strip()}\"")
+        if (metric := ALERT_METRICS.get(match.group("metric").lower())) is None:
+            raise ValueError(f"Unknown metric \"{match.group("metric")}\". Use one of: {", ".join(ALERT_METRICS)}")
+        value = match.group("value")
+        threshold = -string_to_number(value[1:]) if value.startswith("-") else string_to_number(value)
+        conditions.append((metric, match.group("op"), threshold))
+    return conditions
+
+
+class AlertIndex:
+    """
+    Sorted threshold indexes per (address, metric, operator).
+
+    A rule fires once when its condition becomes true and re-arms once it is false again. The index remembers the last
+    value per (address, metric), so the rules that became true are exactly those whose thresholds lie between the
+    previous and the new value, found with two binary searches. A rule that is already true when it is added fires at
+    the next match.
+    """
+
+    def __init__(self):
+        self.thresholds: Dict[Tuple[str, str, str], List[Tuple[float, int]]] = defaultdict(list)
+        self.rules: Dict[int, AlertRule] = {}
+        self.values: Dict[Tuple[str, str], float] = {}
+        self.pending: Dict[Tuple[str, str], Set[int]] = defaultdict(set)
+
+    @staticmethod
+    def _holds(rule: AlertRule, value: float) -> bool:
+        return value > rule.threshold if rule.op == ">" else value < rule.threshold
+
+    def add(self, rule: AlertRule):
+        self.rules[rule.id] = rule
+        insort(self.thresholds[(rule.address, rule.metric, rule.op)], (rule.threshold, rule.id))
+        if (value := self.values.get((rule.address, rule.metric))) is not None and self._holds(rule, value):
+            self.pending[(rule.address, rule.metric)].add(rule.id)
+
+    def remove(self, rule: AlertRule):
+        self.rules.pop(rule.id, None)
+        self.thresholds[(rule.address, rule.metric, rule.op)].remove((rule.threshold, rule.id))
+        self.pending[(rule.address, rule.metric)].discard(rule.id)
+
+    def match(self, pairs: Iterable[PairData]) -> Tuple[List[Tuple[AlertRule, float]], Dict[Tuple[str, str], float]]:
+        """
+        Return the rules that newly fired for a batch of pairs, with the values that fired them, and the new values of
+        the watched (address, metric) keys.
+        """
+
+        fired, updated = [], {}
+        for pair in pairs:
+            for metric in METRIC_ATTRIBUTES:
+                above = self.thresholds.get((pair.address, metric, ">"))
+                below = self.thresholds.get((pair.address, metric, "<"))
+                if not above and not below or (value := getattr(pair, metric)) is None:
+                    continue
+
+                key = (pair.address, metric)
+                previous = self.values.get(key)
+                matched = []
+                if above:
+                    start = 0 if previous is None else bisect_left(above, (previous, -1))
+                    matched.extend(above[start:bisect_left(above, (value, -1))])
+                if below:
+                    end = len(below) if previous is None else bisect_right(below, (previous, float("inf")))
+                    matched.extend(below[bisect_right(below, (value, float("inf"))):end])
+                fired.extend((self.rules[rule_id], value) for _, rule_id in matched)
+
+                for rule_id in self.pending.pop(key, ()):
+                    if self._holds(rule := self.rules[rule_id], value):
+                        fired.append((rule, value))
+
+                if value != previous:
+                    self.values[key] = updated[key] = value
+        return fired, updated
+
+
+class AlertManager:
+    """
+    Persists alert rules per chat in SQLite and matches them against every cycle's pairs.
+
+    The last value of every watched metric is persisted too, so rules that are still true do not fire again after a
+    restart.
+    """
+
+    def __init__(self, path: str = "data/alerts.sqlite"):
+        self.path = Path(path)
+        self.index = AlertIndex()
+        self.lock = Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self.path)) as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS alerts (id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER NOT NULL, "
+                "address TEXT NOT NULL, token TEXT NOT NULL, metric TEXT NOT NULL, op TEXT NOT NULL, "
+                "threshold REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS alert_values (address TEXT NOT NULL, metric TEXT NOT NULL, "
+                "value REAL NOT NULL, PRIMARY KEY (address, metric))"
+            )
+            for row in connection.execute("SELECT id, chat_id, address, token, metric, op, threshold FROM alerts"):
+                self.index.add(AlertRule(*row))
+            for address, metric, value in connection.execute("SELECT address, metric, value FROM alert_values"):
+                self.index.values[(address, metric)] = value
+
+    def subscribe(self, chat_id: int, address: str, token: str, conditions: List[Tuple[str, str, float]]
+                  ) -> List[AlertRule]:
+        rules = []
+        with self.lock, closing(sqlite3.connect(self.path)) as connection, connection:
+            for metric, op, threshold in conditions:
+                cursor = connection.execute(
+                    "INSERT INTO alerts (chat_id, address, token, metric, op, threshold) VALUES (?, ?, ?, ?, ?, ?)",
+                    (chat_id, address, token, metric, op, threshold)
+                )
+                rule = AlertRule(cursor.lastrowid, chat_id, address, token, metric, op, threshold)
+                self.index.add(rule)
+                rules.append(rule)
+        return rules
+
+    def unsubscribe(self, chat_id: int, rule_id: int) -> bool:
+        with self.lock:
+            if (rule := self.index.rules.get(rule_id)) is None or rule.chat_id != chat_id:
+                return False
+            with closing(sqlite3.connect(self.path)) as connection, connection:
+                connection.execute("DELETE FROM alerts WHERE id = ?", (rule_id,))
+            self.index.remove(rule)
+        return True
+
+    def rules_of(self, chat_id: int) -> List[AlertRule]:
+        with self.lock:
+            return sorted((rule for rule in self.index.rules.values() if rule.chat_id == chat_id),
+                          key=lambda rule: rule.id)
+
+    def match(self, pairs: Iterable[PairData]) -> Dict[int, List[str]]:
+        """Match a batch of pairs and group the alert texts by chat."""
+
+        with self.lock:
+            fired, updated = self.index.match(pairs)
+            if updated:
+                with closing(sqlite3.connect(self.path)) as connection, connection:
+                    connection.executemany(
+                        "INSERT INTO alert_values (address, metric, value) VALUES (?, ?, ?) "
+                        "ON CONFLICT (address, metric) DO UPDATE SET value = excluded.value",
+                        [(address, metric, value) for (address, metric), value in updated.items()]
+                    )
+
+        alerts: Dict[int, List[str]] = defaultdict(list)
+        for rule, value in fired:
+            current = f"{value:g}%" if rule.metric in PERCENT_METRICS else number_to_string(value)
+            alerts[rule.chat_id].append(f"🔔 {rule.describe()} (now {current})")
+        return alerts
+
+
+class RateLimitedSender:
+    """
+    Delivers messages from a background thread within Telegram's rate limits.
+
+    Messages are spaced at least `global_interval` seconds apart overall and `chat_interval` seconds apart per chat.
+    """
+
+    def __init__(self, send: Callable[[int, str], None], global_interval: float = 1 / 25, chat_interval: float = 1):
+        self.send = send
+        self.global_interval = global_interval
+        self.chat_interval = chat_interval
+        self.queue: Queue = Queue()
+        self.last_sent: Dict[int, float] = {}
+        Thread(target=self._run, daemon=True).start()
+
+    def submit(self, chat_id: int, text: str):
+        self.queue.put((chat_id, text))
+
+    def _run(self):
+        last_global: Optional[float] = None
+        while True:
+            chat_id, text = self.queue.get()
+            now = monotonic()
+            wait_until = max(self.last_sent.get(chat_id, 0) + self.chat_interval,
+                             (last_global or 0) + self.global_interval)
+            if wait_until > now:
+                sleep(wait_until - now)
+            try:
+                self.send(chat_id, text)
+            except Exception as e:
+                print(f"Error sending alert to {chat_id}: {e}")
+            last_global = self.last_sent[chat_id] = monotonic()
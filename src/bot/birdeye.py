@@ -1,14 +1,14 @@
 from os import getenv
 from pathlib import Path
 from random import uniform
-from typing import Dict
+from typing import Dict, Optional
 
 from dotenv import load_dotenv
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from seleniumbase import SB
 
-from bot.utils import wait_for_url_change, define_risk_level
+from bot.utils import wait_for_url_change, define_risk_level, Deadline
+from browser import BrowserProfile, open_browser
 from models import SecurityData, RiskLevel
 
 dotenv_path = Path(r"..\..\.env")
@@ -16,52 +16,68 @@
 user_data_dir = getenv("USER_DATA_DIR")
 
 
-def check_security_risks(sb, token_name: str, url="https://www.birdeye.so/") -> SecurityData:
-    """Check security risks for a given token on Birdeye using SeleniumBase."""
+def _limit_page_load(sb, deadline: Deadline, cap: float):
+    """Bound the page load that the next driver call may trigger by the deadline."""
 
+    sb.driver.set_page_load_timeout(deadline.timeout(cap))
+
+
+def check_security_risks(sb, token_name: str, url="https://www.birdeye.so/",
+                         deadline: Optional[Deadline] = None) -> SecurityData:
+    """
+    Check security risks for a given token on Birdeye using SeleniumBase.
+
+    All waits, clicks and page loads share the `deadline` budget (30 seconds by default), so a stuck page cannot stall
+    the cycle for longer. The page load timeout of the driver is restored afterwards.
+    """
+
+    deadline = deadline or Deadline(30)
+    page_load_timeout = sb.driver.timeouts.page_load
     try:
+        _limit_page_load(sb, deadline, 15)
         sb.driver.get(url)
 
-        sb.driver.execute_script("document.body.style.zoom=\"50%\"")
-        sb.driver.set_window_size(1920, 1080)
-
-        sb.click(r"div.w-full.bg-transparent > span")
-        sb.sleep(2)
+        _limit_page_load(sb, deadline, 10)
+        sb.click(r"div.w-full.bg-transparent > span", timeout=deadline.timeout(10))
+        sb.sleep(deadline.timeout(2))
 
-        search_input = sb.wait_for_element("div.border-b.bg-neutral-50 input", timeout=10)
+        search_input = sb.wait_for_element("div.border-b.bg-neutral-50 input", timeout=deadline.timeout(10))
         search_input.clear()
 
         for char in token_name.split("/")[0]:
             search_input.send_keys(char)
-            sb.sleep(uniform(0.05, 0.1))
+            sb.sleep(deadline.timeout(uniform(0.05, 0.1)))
 
-        sb.wait_for_element_clickable("div.flex.items-center.justify-center.gap-4 > div > div > div", timeout=10)
-        sb.click("div.flex.items-center.justify-center.gap-4 > div > div > div")
-        sb.sleep(2)
+        sb.wait_for_element_clickable("div.flex.items-center.justify-center.gap-4 > div > div > div",
+                                      timeout=deadline.timeout(10))
+        sb.click("div.flex.items-center.justify-center.gap-4 > div > div > div", timeout=deadline.timeout(10))
+        sb.sleep(deadline.timeout(2))
 
-        sb.wait_for_element_clickable("div[data-value='solana']", timeout=10)
-        sb.click("div[data-value='solana']")
-        sb.sleep(2)
+        sb.wait_for_element_clickable("div[data-value='solana']", timeout=deadline.timeout(10))
+        sb.click("div[data-value='solana']", timeout=deadline.timeout(10))
+        sb.sleep(deadline.timeout(2))
 
+        _limit_page_load(sb, deadline, 10)
         search_input.send_keys(Keys.RETURN)
 
-        wait_for_url_change(sb, "token", timeout=3)
+        wait_for_url_change(sb, "token", timeout=deadline.timeout(3))
 
         url = sb.get_current_url()
         if "token" not in url:
             css_selector = "div > div > div > div:first-child div table tbody tr:first-child td:first-child a"
-            sb.wait_for_element_clickable(css_selector, timeout=10)
+            sb.wait_for_element_clickable(css_selector, timeout=deadline.timeout(10))
             url = sb.find_element(css_selector).get_attribute("href")
 
+        _limit_page_load(sb, deadline, 15)
         sb.driver.get(url + "&tab=security")
 
-        wait_for_url_change(sb, "security", timeout=5, error_type="raise")
+        wait_for_url_change(sb, "security", timeout=deadline.timeout(5), error_type="raise")
 
         sb.wait_for_element_clickable("div > div > div > div.col-span-11.py-8.lg\\:col-span-5 > div > button",
-                                      timeout=5)
-        sb.click("div > div > div > div.col-span-11.py-8.lg\\:col-span-5 > div > button")
+                                      timeout=deadline.timeout(5))
+        sb.click("div > div > div > div.col-span-11.py-8.lg\\:col-span-5 > div > button", timeout=deadline.timeout(5))
 
-        security_content = sb.wait_for_element("div.mt-4.space-y-1")
+        security_content = sb.wait_for_element("div.mt-4.space-y-1", timeout=deadline.timeout(10))
 
         sb.driver.execute_script(
             "arguments[0].scrollIntoView({behavior: \"smooth\", block: \"center\", inline: \"center\"});",
@@ -106,6 +122,8 @@ def check_security_risks(sb, token_name: str, url="https://www.birdeye.so/") ->
     except Exception as e:
         print(f"Error checking security for {token_name}: {str(e)}")
         return SecurityData(c={}, h={}, m={}, n={}, error=str(e))
+    finally:
+        sb.driver.set_page_load_timeout(page_load_timeout)
 
 
 def should_post_token(security_data: SecurityData) -> bool:
@@ -120,7 +138,7 @@ def should_post_token(security_data: SecurityData) -> bool:
 if __name__ == "__main__":
     """Run a test to check security risks for a token."""
 
-    with SB(uc=True, headless=False, user_data_dir=user_data_dir) as sb_main:
+    with open_browser(BrowserProfile(user_data_dir=user_data_dir)) as sb_main:
         try:
             test_token = "SOL/USDC"
             security_info = check_security_risks(sb_main, test_token)
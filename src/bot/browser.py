@@ -0,0 +1,109 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from os import getenv
+from typing import Dict, Optional, Tuple
+
+from seleniumbase import SB
+
+BLOCKED_EXTENSIONS = (
+    "png", "jpg", "jpeg", "gif", "webp", "avif", "ico",
+    "woff", "woff2", "ttf", "otf",
+    "mp4", "webm", "mp3", "m3u8",
+)
+
+# Each extension is matched at the end of the URL and before a query string, as CDNs often add one ("…png?size=lg").
+BLOCKED_RESOURCES = tuple(pattern for extension in BLOCKED_EXTENSIONS
+                          for pattern in (f"*.{extension}", f"*.{extension}?*"))
+
+BLOCKED_HOSTS = (
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+    "*facebook.net*", "*hotjar.com*", "*clarity.ms*", "*segment.io*", "*mixpanel.com*", "*amplitude.com*",
+    "*intercom.io*", "*sentry.io*", "*datadoghq.com*", "*posthog.com*",
+)
+
+ZOOM_SCRIPT = """
+document.addEventListener("DOMContentLoaded", () => { document.body.style.zoom = "%s"; });
+"""
+
+PAGE_METRICS_SCRIPT = """
+const [navigation] = performance.getEntriesByType("navigation");
+return {
+    load_ms: navigation ? navigation.loadEventEnd - navigation.startTime : null,
+    dom_ms: navigation ? navigation.domContentLoadedEventEnd - navigation.startTime : null,
+    resources: performance.getEntriesByType("resource").length,
+};
+"""
+
+
+@dataclass(frozen=True)
+class BrowserProfile:
+    """Launch and per-session settings of a SeleniumBase browser."""
+
+    headless: bool = False
+    user_data_dir: Optional[str] = None
+    window_size: Tuple[int, int] = (1920, 1080)
+    zoom: Optional[str] = "50%"
+    blocked_urls: Tuple[str, ...] = BLOCKED_RESOURCES + BLOCKED_HOSTS
+
+
+def profile_from_env() -> BrowserProfile:
+    """Build the browser profile from the BROWSER_HEADLESS and BROWSER_BLOCK_RESOURCES environment variables."""
+
+    profile = BrowserProfile(headless=getenv("BROWSER_HEADLESS", "0") == "1")
+    if getenv("BROWSER_BLOCK_RESOURCES", "1") != "1":
+        profile = replace(profile, blocked_urls=())
+    return profile
+
+
+def apply_browser_profile(sb, profile: BrowserProfile):
+    """
+    Apply the session-wide settings of a profile once, right after the browser starts.
+
+    Unneeded resource types and third-party trackers are blocked through DevTools, and the zoom is injected into
+    every new document, so individual page loads do not have to set them up again.
+    """
+
+    sb.driver.set_window_size(*profile.window_size)
+
+    if profile.blocked_urls:
+        sb.driver.execute_cdp_cmd("Network.enable", {})
+        sb.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(profile.blocked_urls)})
+
+    if profile.zoom:
+        sb.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": ZOOM_SCRIPT % profile.zoom})
+
+    sb.driver.execute_cdp_cmd("Performance.enable", {})
+
+
+@contextmanager
+def open_browser(profile: BrowserProfile = BrowserProfile()):
+    """Open a SeleniumBase browser with the profile applied."""
+
+    with SB(uc=True, headless2=profile.headless, user_data_dir=profile.user_data_dir) as sb:
+        apply_browser_profile(sb, profile)
+        yield sb
+
+
+def page_metrics(sb) -> Dict[str, Optional[float]]:
+    """Measure the load time, resource count and memory use of the current tab."""
+
+    metrics = sb.driver.execute_script(PAGE_METRICS_SCRIPT)
+    performance = {metric["name"]: metric["value"]
+                   for metric in sb.driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]}
+    metrics["js_heap_mb"] = performance.get("JSHeapUsedSize", 0) / 2 ** 20
+    metrics["dom_nodes"] = performance.get("Nodes")
+    return metrics
+
+
+if __name__ == "__main__":
+    """Compare page load time and tab memory with and without resource blocking."""
+
+    from dexscreener import listing_url
+
+    for name, browser_profile in (("baseline", BrowserProfile(blocked_urls=(), zoom=None)),
+                                  ("tuned", profile_from_env())):
+        with open_browser(browser_profile) as sb_main:
+            for page_url in (listing_url(), "https://www.birdeye.so/"):
+                sb_main.driver.get(page_url)
+                sb_main.sleep(5)
+                print(f"{name}: {page_url}: {page_metrics(sb_main)}")
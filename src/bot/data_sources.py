@@ -0,0 +1,394 @@
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from asyncio import (new_event_loop, gather, wait, wait_for, sleep as async_sleep, create_task, FIRST_COMPLETED,
+                     TimeoutError as AsyncTimeoutError)
+from time import time, sleep
+from typing import Dict, Iterable, List, Optional, Set
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, ClientError
+
+from birdeye import check_security_risks
+from browser import BrowserProfile, open_browser, profile_from_env
+from dexscreener import scrape_dexscreener_data, listing_url, MAX_ON_PAGE
+from models import PairData, SecurityData, RiskLevel
+from scoring_config import SCORING_CONFIG
+from utils import Deadline
+
+REPLAY_ROUTES = (
+    ("/token-profiles/latest/v1", "token_profiles.json"),
+    ("/tokens/v1/solana/", "tokens.json"),
+    ("/latest/dex/pairs/solana/", "pairs.json"),
+    ("/defi/token_security", "birdeye_token_security.json"),
+    ("/api/v1/solana/token_security", "goplus_token_security.json"),
+)
+
+ISSUE_LEVELS = {issue: risk_scoring.level for risk_scoring in SCORING_CONFIG for issue in risk_scoring.weights}
+
+
+def _flag(value) -> Optional[str]:
+    return "Yes" if value else None
+
+
+def _goplus_status(item: Optional[dict]) -> Optional[str]:
+    return "Yes" if (item or {}).get("status") == "1" else None
+
+
+def _percent(value) -> Optional[str]:
+    return f"{float(value) * 100:.2f}%" if value is not None else None
+
+
+BIRDEYE_CHECKS = {
+    "mutable info": lambda data: _flag(data.get("mutableMetadata")),
+    "freezable": lambda data: _flag(data.get("freezeable")),
+    "transfer fees enable": lambda data: _flag(data.get("transferFeeEnable")),
+    "jupiter strict list": lambda data: "No" if data.get("jupStrictList") is False else None,
+    "top holders percentage": lambda data: _percent(data.get("top10HolderPercent")),
+    "token percentage of creator": lambda data: _percent(data.get("creatorPercentage")),
+    "token percentage of owner": lambda data: _percent(data.get("ownerPercentage")),
+    "freeze authority": lambda data: data.get("freezeAuthority"),
+    "creator address": lambda data: data.get("creatorAddress"),
+    "owner address": lambda data: data.get("ownerAddress"),
+}
+
+GOPLUS_CHECKS = {
+    "owner can change balance": lambda data: _goplus_status(data.get("balance_mutable_authority")),
+    "mintable": lambda data: _goplus_status(data.get("mintable")),
+    "freezable": lambda data: _goplus_status(data.get("freezable")),
+    "transfer fees enable": lambda data: _goplus_status(data.get("transfer_fee_upgradable")),
+    "transfer fees": lambda data: _flag(data.get("transfer_fee")),
+    "mutable info": lambda data: _goplus_status(data.get("metadata_mutable")),
+}
+
+
+def pair_from_json(pair: dict, now: Optional[float] = None) -> PairData:
+    """
+    Build `PairData` from a pair object of the Dexscreener HTTP API.
+
+    The API does not report the number of makers, so it is left unknown rather than set to 0.
+    """
+
+    now = time() if now is None else now
+    price_change = pair.get("priceChange") or {}
+    transactions = (pair.get("txns") or {}).get("h24") or {}
+
+    return PairData(
+        token=f"{pair["baseToken"]["symbol"]}/{pair["quoteToken"]["symbol"]}",
+        description=pair["baseToken"].get("name", ""),
+        address=pair["pairAddress"],
+        price=float(pair.get("priceUsd") or 0),
+        age=max(0, int((now - pair.get("pairCreatedAt", now * 1000) / 1000) // 60)),
+        buys=int(transactions.get("buys", 0)),
+        sells=int(transactions.get("sells", 0)),
+        volume=float((pair.get("volume") or {}).get("h24", 0)),
+        makers=None,
+        five_min_change=price_change.get("m5"),
+        one_hour_change=price_change.get("h1"),
+        six_hour_change=price_change.get("h6"),
+        twenty_four_hour_change=price_change.get("h24"),
+        liquidity=float((pair.get("liquidity") or {}).get("usd", 0)),
+        market_cap=float(pair.get("marketCap") or pair.get("fdv") or 0),
+    )
+
+
+def security_from_json(birdeye: dict, goplus: dict) -> SecurityData:
+    """
+    Build `SecurityData` from the Birdeye and GoPlus token security APIs.
+
+    Only risky findings and informational values that are present are recorded, each under the risk level that
+    `SCORING_CONFIG` assigns to the issue, so the result is scored the same way as the scraped Birdeye security tab.
+    """
+
+    security_data: Dict[str, Dict[str, Dict[str, Optional[str]]]] = {risk_level.value: {} for risk_level in RiskLevel}
+
+    for platform, checks, data in (("birdeye", BIRDEYE_CHECKS, birdeye), ("goplus", GOPLUS_CHECKS, goplus)):
+        for issue, check in checks.items():
+            if (description := check(data)) is None:
+                continue
+            details = security_data[ISSUE_LEVELS[issue].value].setdefault(issue, {"birdeye": None, "goplus": None})
+            details[platform] = description
+
+    return SecurityData(**security_data)
+
+
+class DataSource(ABC):
+    """A backend that discovers new pairs and checks their security. Use it as a context manager."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        pass
+
+    @abstractmethod
+    def fetch_pairs(self, page: int = 1) -> Set[PairData]:
+        """Return the newest pairs that pass the listing filters, one listing page at a time."""
+
+    @abstractmethod
+    def check_security(self, pairs: Iterable[PairData]) -> Dict[str, SecurityData]:
+        """Return the security data of every pair, keyed by pair address."""
+
+
+class SeleniumDataSource(DataSource):
+    """Scrapes the Dexscreener listing and the Birdeye security tab in a SeleniumBase browser."""
+
+    def __init__(self, profile: Optional[BrowserProfile] = None, security_budget: float = 30, retries: int = 2,
+                 backoff: float = 1):
+        self.profile = profile or profile_from_env()
+        self.security_budget = security_budget
+        self.retries = retries
+        self.backoff = backoff
+        self._sb_context = None
+        self.sb = None
+
+    def __enter__(self):
+        self._sb_context = open_browser(self.profile)
+        self.sb = self._sb_context.__enter__()
+        return self
+
+    def close(self):
+        if self._sb_context is not None:
+            self._sb_context.__exit__(None, None, None)
+            self._sb_context, self.sb = None, None
+
+    def fetch_pairs(self, page: int = 1) -> Set[PairData]:
+        return scrape_dexscreener_data(self.sb, listing_url(page))
+
+    def _check_pair_security(self, pair: PairData) -> SecurityData:
+        deadline = Deadline(self.security_budget)
+        for attempt in range(self.retries):
+            security = check_security_risks(self.sb, pair.token, deadline=deadline)
+            if security.error is None or deadline.left() <= self.backoff * 2 ** attempt:
+                return security
+            sleep(self.backoff * 2 ** attempt)
+        return security
+
+    def check_security(self, pairs: Iterable[PairData]) -> Dict[str, SecurityData]:
+        return {pair.address: self._check_pair_security(pair) for pair in pairs}
+
+
+class HttpDataSource(DataSource):
+    """
+    Reads pairs and security data from the Dexscreener, Birdeye and GoPlus JSON APIs without a browser.
+
+    Requests share pooled `aiohttp` sessions and run concurrently on a private event loop. Base URLs can be pointed
+    at a local stub server that replays recorded JSON (see `run_replay_server`).
+
+    The public API has no listing of the newest pairs, so candidates come from the latest token profiles, and only the
+    newest Solana pair of each token is kept. This approximates, but does not equal, the `rankBy=pairAge` listing of
+    the browser backend, and the number of makers is not available.
+
+    Every security check gets a hard `security_budget` in seconds and up to `retries` attempts with exponential
+    backoff. When an attempt is still running after `hedge_delay` seconds, a hedged attempt is sent through another
+    session and whichever answers first wins.
+    """
+
+    def __init__(
+            self,
+            dexscreener_url: str = "https://api.dexscreener.com",
+            birdeye_url: str = "https://public-api.birdeye.so",
+            goplus_url: str = "https://api.gopluslabs.io",
+            birdeye_api_key: Optional[str] = None,
+            min_liquidity: float = 2000,
+            min_age: int = 3,
+            max_pairs: int = MAX_ON_PAGE,
+            pool_size: int = 10,
+            timeout: float = 10,
+            sessions: int = 2,
+            security_budget: float = 15,
+            retries: int = 3,
+            backoff: float = .5,
+            hedge_delay: float = 2,
+    ):
+        self.dexscreener_url = dexscreener_url.rstrip("/")
+        self.birdeye_url = birdeye_url.rstrip("/")
+        self.goplus_url = goplus_url.rstrip("/")
+        self.birdeye_api_key = birdeye_api_key
+        self.min_liquidity = min_liquidity
+        self.min_age = min_age
+        self.max_pairs = max_pairs
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.security_budget = security_budget
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_delay = hedge_delay
+        self.loop = new_event_loop()
+        self.sessions: List[Optional[ClientSession]] = [None] * sessions
+        self.token_addresses: Dict[str, str] = {}
+
+    def close(self):
+        for session in self.sessions:
+            if session is not None:
+                self.loop.run_until_complete(session.close())
+        self.sessions = [None] * len(self.sessions)
+        self.loop.close()
+
+    async def _get_json(self, url: str, session_index: int = 0, **kwargs):
+        session_index %= len(self.sessions)
+        if self.sessions[session_index] is None:
+            self.sessions[session_index] = ClientSession(connector=TCPConnector(limit=self.pool_size),
+                                                         timeout=ClientTimeout(total=self.timeout))
+        async with self.sessions[session_index].get(url, **kwargs) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def _fetch_pairs(self, page: int) -> Set[PairData]:
+        profiles = await self._get_json(f"{self.dexscreener_url}/token-profiles/latest/v1")
+        token_addresses = list(dict.fromkeys(profile["tokenAddress"] for profile in profiles
+                                             if profile.get("chainId") == "solana"))
+
+        chunks = [token_addresses[i:i + 30] for i in range(0, len(token_addresses), 30)]
+        responses = await gather(*(self._get_json(f"{self.dexscreener_url}/tokens/v1/solana/{",".join(chunk)}")
+                                   for chunk in chunks))
+
+        newest: Dict[str, dict] = {}
+        for pair in (pair for response in responses for pair in response if pair.get("chainId") == "solana"):
+            token_address = (pair.get("baseToken") or {}).get("address")
+            created_at = pair.get("pairCreatedAt", 0)
+            if token_address not in newest or created_at > newest[token_address].get("pairCreatedAt", 0):
+                newest[token_address] = pair
+
+        pairs: List[PairData] = []
+        for token_address, pair in newest.items():
+            try:
+                pair_data = pair_from_json(pair)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Error processing pair: {e}")
+                continue
+            if pair_data.liquidity >= self.min_liquidity and pair_data.age >= self.min_age:
+                self.token_addresses[pair_data.address] = token_address
+                pairs.append(pair_data)
+
+        pairs.sort(key=lambda pair_data: pair_data.age)
+        return set(pairs[(page - 1) * self.max_pairs:page * self.max_pairs])
+
+    async def _token_address(self, pair: PairData, session_index: int) -> str:
+        if pair.address not in self.token_addresses:
+            response = await self._get_json(f"{self.dexscreener_url}/latest/dex/pairs/solana/{pair.address}",
+                                            session_index)
+            self.token_addresses[pair.address] = response["pairs"][0]["baseToken"]["address"]
+        return self.token_addresses[pair.address]
+
+    async def _birdeye_security(self, token_address: str, session_index: int) -> dict:
+        if not self.birdeye_api_key:
+            return {}
+        response = await self._get_json(f"{self.birdeye_url}/defi/token_security", session_index,
+                                        params={"address": token_address},
+                                        headers={"X-API-KEY": self.birdeye_api_key, "x-chain": "solana"})
+        return response.get("data") or {}
+
+    async def _goplus_security(self, token_address: str, session_index: int) -> dict:
+        response = await self._get_json(f"{self.goplus_url}/api/v1/solana/token_security", session_index,
+                                        params={"contract_addresses": token_address})
+        return (response.get("result") or {}).get(token_address) or {}
+
+    async def _security_attempt(self, pair: PairData, session_index: int) -> SecurityData:
+        token_address = await self._token_address(pair, session_index)
+        birdeye, goplus = await gather(self._birdeye_security(token_address, session_index),
+                                       self._goplus_security(token_address, session_index))
+        return security_from_json(birdeye, goplus)
+
+    async def _hedged_security_attempt(self, pair: PairData, attempt: int) -> SecurityData:
+        pending = {create_task(self._security_attempt(pair, attempt))}
+        done, pending = await wait(pending, timeout=self.hedge_delay)
+        if not done:
+            pending.add(create_task(self._security_attempt(pair, attempt + 1)))
+
+        try:
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not pending:
+                    raise task.exception()
+                done, pending = await wait(pending, return_when=FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _check_security(self, pair: PairData) -> SecurityData:
+        deadline = self.loop.time() + self.security_budget
+        error = None
+        for attempt in range(self.retries):
+            try:
+                return await wait_for(self._hedged_security_attempt(pair, attempt), deadline - self.loop.time())
+            except (ClientError, AsyncTimeoutError, KeyError, IndexError, TypeError, ValueError) as e:
+                error = str(e) or type(e).__name__
+                delay = self.backoff * 2 ** attempt
+                if self.loop.time() + delay >= deadline:
+                    break
+                await async_sleep(delay)
+
+        print(f"Error checking security for {pair.token}: {error}")
+        return SecurityData(c={}, h={}, m={}, n={}, error=error)
+
+    async def _check_securities(self, pairs: List[PairData]) -> List[SecurityData]:
+        return await gather(*(self._check_security(pair) for pair in pairs))
+
+    def fetch_pairs(self, page: int = 1) -> Set[PairData]:
+        return self.loop.run_until_complete(self._fetch_pairs(page))
+
+    def check_security(self, pairs: Iterable[PairData]) -> Dict[str, SecurityData]:
+        pairs = list(pairs)
+        results = self.loop.run_until_complete(self._check_securities(pairs))
+        return {pair.address: security for pair, security in zip(pairs, results)}
+
+
+def make_replay_server(fixtures_dir: Path, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """
+    Build a local stub of the Dexscreener, Birdeye and GoPlus APIs that replays recorded JSON responses.
+
+    Each route of `REPLAY_ROUTES` is answered with its file from `fixtures_dir`, so one server can stand in for all
+    three base URLs of `HttpDataSource`. Port 0 picks a free port, see `server.server_address`.
+    """
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            file_name = next((name for prefix, name in REPLAY_ROUTES if path.startswith(prefix)), None)
+            if file_name is None or not (fixtures_dir / file_name).exists():
+                self.send_response(404)
+                self.end_headers()
+                return
+
+            body = (fixtures_dir / file_name).read_bytes()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), ReplayHandler)
+
+
+def create_data_source(name: str = "selenium", birdeye_api_key: Optional[str] = None) -> DataSource:
+    """Create a pair discovery backend by name: "selenium" or "http"."""
+
+    if name == "http":
+        return HttpDataSource(birdeye_api_key=birdeye_api_key)
+    return SeleniumDataSource()
+
+
+if __name__ == "__main__":
+    """Run the HTTP data source against the recorded API responses in fixtures/http_api."""
+
+    from threading import Thread
+
+    replay_server = make_replay_server(Path(__file__).parent / "fixtures" / "http_api")
+    Thread(target=replay_server.serve_forever, daemon=True).start()
+    stub_url = "http://{}:{}".format(*replay_server.server_address)
+
+    with HttpDataSource(stub_url, stub_url, stub_url, birdeye_api_key="replay", min_age=0) as http_source:
+        replayed_pairs = http_source.fetch_pairs()
+        securities = http_source.check_security(replayed_pairs)
+        for replayed_pair in replayed_pairs:
+            print(replayed_pair)
+            print(securities[replayed_pair.address])
+    replay_server.shutdown()
@@ -0,0 +1,221 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Set
+
+from selenium.webdriver.common.by import By
+
+from browser import BrowserProfile, apply_browser_profile
+from models import PairData
+from utils import transform_token, string_to_number, as_number, get_solana_address, to_minutes, wait_for_url_change
+
+MAX_ON_PAGE = 100
+DEXSCREENER_LISTING_URL = "https://dexscreener.com/solana{page}?rankBy=pairAge&order=asc&minLiq=2000&minAge=3"
+
+ROW_SELECTOR = "a.ds-dex-table-row"
+CELL_SELECTOR = "div.ds-table-data-cell"
+
+OBSERVER_SCRIPT = """
+const [rowSelector, cellSelector, maxSeen] = arguments;
+const readCells = row => Array.from(row.querySelectorAll(cellSelector), cell => cell.innerText);
+const rows = Array.from(document.querySelectorAll(rowSelector), row => ({href: row.href, cells: readCells(row)}));
+if (window.__pairWatcher) return rows;
+const seen = new Set(rows.map(row => row.href));
+let buffer = [];
+const collect = row => {
+    if (!row.href || seen.has(row.href)) return;
+    seen.add(row.href);
+    if (seen.size > maxSeen) seen.delete(seen.values().next().value);
+    buffer.push({href: row.href, row: row, cells: readCells(row)});
+};
+const observer = new MutationObserver(mutations => {
+    for (const mutation of mutations) {
+        if (mutation.type === "attributes") {
+            if (mutation.target.matches(rowSelector)) collect(mutation.target);
+            continue;
+        }
+        for (const node of mutation.addedNodes) {
+            if (node.nodeType !== Node.ELEMENT_NODE) continue;
+            if (node.matches(rowSelector)) collect(node);
+            node.querySelectorAll(rowSelector).forEach(collect);
+        }
+    }
+});
+observer.observe(document.body, {childList: true, subtree: true, attributes: true, attributeFilter: ["href"]});
+window.__pairWatcher = {
+    drain: () => {
+        const rows = buffer.map(entry => ({
+            href: entry.href,
+            cells: entry.row.isConnected && entry.row.href === entry.href ? readCells(entry.row) : entry.cells,
+        }));
+        buffer = [];
+        return rows;
+    },
+};
+return rows;
+"""
+
+DRAIN_SCRIPT = """
+return window.__pairWatcher ? window.__pairWatcher.drain() : null;
+"""
+
+
+def listing_url(page: int = 1) -> str:
+    """Build the Dexscreener new pairs listing URL for a given page."""
+
+    return DEXSCREENER_LISTING_URL.format(page=f"/page-{page}" if page > 1 else "")
+
+
+def pair_from_cells(href: str, cells: List[str]) -> Optional[PairData]:
+    """Build a pair from the link and the cell texts of a listing row, or None if the row is incomplete."""
+
+    if not cells or len(cells) < 13:
+        return None
+
+    token, description = transform_token(cells[0])
+    return PairData(
+        token=token,
+        description=description,
+        address=get_solana_address(href),
+        price=string_to_number(cells[1]),
+        age=to_minutes(cells[2]),
+        buys=as_number(cells[3]),
+        sells=as_number(cells[4]),
+        volume=string_to_number(cells[5]),
+        makers=as_number(cells[6]),
+        five_min_change=string_to_number(cells[7]) if len(cells[7]) > 1 else None,
+        one_hour_change=string_to_number(cells[8]) if len(cells[8]) > 1 else None,
+        six_hour_change=string_to_number(cells[9]) if len(cells[9]) > 1 else None,
+        twenty_four_hour_change=string_to_number(cells[10]) if len(cells[10]) > 1 else None,
+        liquidity=string_to_number(cells[11]),
+        market_cap=string_to_number(cells[12]),
+    )
+
+
+def scrape_dexscreener_data(sb, url=listing_url()):
+    """Scrape data from Dexscreener using SeleniumBase"""
+
+    sb.driver.get(url)
+    wait_for_url_change(sb, "solana", timeout=10)
+
+    pairs_data = set()
+    for i in range(MAX_ON_PAGE):
+        if i == 3:
+            break
+        print(f"Processing pair {i + 1} of {MAX_ON_PAGE}")
+        try:
+            pair = sb.find_elements(ROW_SELECTOR)[i]
+            columns = pair.find_elements(By.CSS_SELECTOR, CELL_SELECTOR)
+
+            pair_data = pair_from_cells(pair.get_attribute("href"), [column.text for column in columns])
+            if pair_data is not None:
+                pairs_data.add(pair_data)
+        except (ValueError, IndexError) as e:
+            print(f"Error processing pair: {e}")
+            continue
+
+    return pairs_data
+
+
+class ListingWatcher:
+    """
+    Keeps the new pairs listing open in its own browser window and collects the rows the page inserts live.
+
+    An in-page `MutationObserver` buffers every row with an unseen link, and `drain` fetches and clears that buffer in
+    a single script call, instead of reloading and re-reading the whole table. The rows present when the watcher first
+    starts count as seen. The page is reloaded every `reload_interval` drains to recover from a stalled feed, and a
+    restarted watcher (e.g. in a new browser) reloads it too. Rows that appeared on a reloaded page but were not yet
+    returned are returned then, as addresses are tracked across reloads. The current window of the browser is restored
+    after each call, so the same session can keep checking security in it.
+    """
+
+    def __init__(self, url: str = listing_url(), profile: BrowserProfile = BrowserProfile(), reload_interval: int = 360,
+                 load_timeout: float = 15, max_seen: int = 10_000):
+        self.sb = None
+        self.url = url
+        self.profile = profile
+        self.reload_interval = reload_interval
+        self.load_timeout = load_timeout
+        self.max_seen = max_seen
+        self.handle = None
+        self.drains = 0
+        self.seen: OrderedDict[str, None] = OrderedDict()
+
+    @contextmanager
+    def _in_window(self):
+        current = self.sb.driver.current_window_handle
+        self.sb.driver.switch_to.window(self.handle)
+        try:
+            yield
+        finally:
+            self.sb.driver.switch_to.window(current)
+
+    def _load(self) -> List[dict]:
+        """Load the listing, install the observer and return the rows it starts with."""
+
+        self.sb.driver.get(self.url)
+        self.sb.wait_for_element(ROW_SELECTOR, timeout=self.load_timeout)
+        return self.sb.driver.execute_script(OBSERVER_SCRIPT, ROW_SELECTOR, CELL_SELECTOR, self.max_seen)
+
+    def start(self, sb) -> Set[PairData]:
+        """
+        Open the listing in a new window of a browser and install the observer.
+
+        Returns the pairs that appeared since the watcher last ran, or nothing on its first start.
+        """
+
+        first_start = self.sb is None
+        self.sb = sb
+        current = sb.driver.current_window_handle
+        sb.driver.switch_to.new_window("window")
+        self.handle = sb.driver.current_window_handle
+        sb.driver.switch_to.window(current)
+        with self._in_window():
+            apply_browser_profile(sb, self.profile)
+            pairs_data = self._new_pairs(self._load())
+        return set() if first_start else pairs_data
+
+    def drain(self) -> Set[PairData]:
+        """Return the pairs inserted since the last call."""
+
+        self.drains += 1
+        with self._in_window():
+            rows = self.sb.driver.execute_script(DRAIN_SCRIPT)
+            if rows is None or self.drains % self.reload_interval == 0:
+                rows = (rows or []) + self._load()
+        return self._new_pairs(rows)
+
+    def _new_pairs(self, rows: Iterable[dict]) -> Set[PairData]:
+        pairs_data = set()
+        for row in rows:
+            try:
+                pair_data = pair_from_cells(row["href"], row["cells"])
+            except (ValueError, IndexError, TypeError) as e:
+                print(f"Error processing pair: {e}")
+                continue
+            if pair_data is None or pair_data.address in self.seen:
+                continue
+            self.seen[pair_data.address] = None
+            if len(self.seen) > self.max_seen:
+                self.seen.popitem(last=False)
+            pairs_data.add(pair_data)
+        return pairs_data
+
+
+if __name__ == "__main__":
+    """Watch a listing page (the local fixture by default) and print the pairs it inserts."""
+
+    from pathlib import Path
+    from sys import argv
+    from time import sleep
+
+    from browser import open_browser, profile_from_env
+
+    watch_url = argv[1] if len(argv) > 1 else (Path(__file__).parent / "fixtures" / "live_listing.html").as_uri()
+    browser_profile = profile_from_env()
+    with open_browser(browser_profile) as sb_main:
+        watcher = ListingWatcher(watch_url, browser_profile)
+        watcher.start(sb_main)
+        while True:
+            sleep(2)
+            for new_pair in watcher.drain():
+                print(f"New pair: {new_pair.token} {new_pair.address}")
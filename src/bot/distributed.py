@@ -0,0 +1,315 @@
+import sqlite3
+from contextlib import contextmanager, closing
+from dataclasses import asdict
+from json import dumps, loads
+from multiprocessing import Process, get_context
+from os import getenv, getpid
+from pathlib import Path
+from socket import gethostname
+from time import time, sleep
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from data_sources import create_data_source
+from models import PairData, SecurityData
+
+Publisher = Callable[[List[PairData], Dict[str, SecurityData]], None]
+
+
+def pair_to_dict(pair: PairData) -> dict:
+    return asdict(pair)
+
+
+def pair_from_dict(data: dict) -> PairData:
+    security = data.get("security")
+    return PairData(**{**data, "security": SecurityData(**security) if security else None})
+
+
+def worker_name() -> str:
+    """A name that is unique across processes and hosts sharing the queue."""
+
+    return f"{gethostname()}:{getpid()}"
+
+
+class WorkQueue:
+    """
+    A durable task queue in a local SQLite file, shared by the coordinator, the workers and the publisher.
+
+    Tasks are claimed with a lease, so a task whose worker died is handed out again once the lease expires, up to
+    `max_attempts` times. Every operation opens its own short transaction, so any number of processes can use the same
+    file concurrently. The file is in WAL mode, which relies on shared memory, so all of them must run on the host that
+    holds the file; network filesystems are not supported. Finished cycles are claimed for publishing with a lease as
+    well, and deleted with their tasks only once they have been published.
+    """
+
+    def __init__(self, path: str = "data/work_queue.sqlite", lease_seconds: float = 120, max_attempts: int = 3):
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self.path, timeout=30)) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS cycles (
+                    cycle TEXT PRIMARY KEY,
+                    created REAL NOT NULL,
+                    publishing_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    cycle TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    leased_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT
+                );
+                CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, leased_until);
+                CREATE INDEX IF NOT EXISTS tasks_cycle ON tasks (cycle, kind);
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT NOT NULL,
+                    expires REAL NOT NULL
+                );
+            """)
+            columns = {name for _, name, *_ in connection.execute("PRAGMA table_info(cycles)")}
+            if "publishing_until" not in columns:
+                connection.execute("ALTER TABLE cycles ADD COLUMN publishing_until REAL")
+                connection.execute("ALTER TABLE cycles ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _transaction(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def start_cycle(self, pages: int) -> str:
+        """Register a new cycle and enqueue one listing task per page."""
+
+        cycle = f"{time():.0f}"
+        with self._transaction() as connection:
+            connection.execute("INSERT OR IGNORE INTO cycles (cycle, created) VALUES (?, ?)", (cycle, time()))
+            connection.executemany("INSERT INTO tasks (cycle, kind, payload) VALUES (?, 'pairs', ?)",
+                                   [(cycle, dumps({"page": page})) for page in range(1, pages + 1)])
+        return cycle
+
+    def claim(self, worker: str) -> Optional[Tuple[int, str, str, dict]]:
+        """
+        Lease the oldest runnable task, returning its id, cycle, kind and payload.
+
+        Expired leases of tasks that already used up their attempts (their worker kept dying) are marked failed instead.
+        """
+
+        now = time()
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = 'failed', result = ? "
+                "WHERE status = 'leased' AND leased_until < ? AND attempts >= ?",
+                (dumps({"error": "Lease expired too many times"}), now, self.max_attempts)
+            )
+            row = connection.execute(
+                "SELECT id, cycle, kind, payload FROM tasks "
+                "WHERE status = 'pending' OR (status = 'leased' AND leased_until < ?) ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE tasks SET status = 'leased', worker = ?, leased_until = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (worker, now + self.lease_seconds, row[0])
+            )
+        task_id, cycle, kind, payload = row
+        return task_id, cycle, kind, loads(payload)
+
+    def complete(self, task_id: int, worker: str, result, follow_up: Optional[List[Tuple[str, dict]]] = None):
+        """
+        Store a task result and atomically enqueue the tasks that depend on it.
+
+        Results of a worker whose lease was taken over by another worker are dropped, so follow-up tasks are never
+        enqueued twice.
+        """
+
+        with self._transaction() as connection:
+            if (row := connection.execute("SELECT cycle FROM tasks WHERE id = ?", (task_id,)).fetchone()) is None:
+                return
+            cycle, = row
+            updated = connection.execute(
+                "UPDATE tasks SET status = 'done', result = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (dumps(result), task_id, worker)
+            ).rowcount
+            if not updated:
+                return
+            connection.executemany("INSERT INTO tasks (cycle, kind, payload) VALUES (?, ?, ?)",
+                                   [(cycle, kind, dumps(payload)) for kind, payload in follow_up or []])
+
+    def fail(self, task_id: int, worker: str, error: str):
+        """Release a failed task for another attempt, or give up on it after `max_attempts`."""
+
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, result = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (self.max_attempts, dumps({"error": error}), task_id, worker)
+            )
+
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        """Take or renew a named lease; only one holder can own it until it expires."""
+
+        now = time()
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT INTO leases (name, holder, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires = excluded.expires "
+                "WHERE leases.holder = excluded.holder OR leases.expires < ?",
+                (name, holder, now + ttl, now)
+            )
+            current_holder, = connection.execute("SELECT holder FROM leases WHERE name = ?", (name,)).fetchone()
+        return current_holder == holder
+
+    def claim_finished_cycle(self) -> Optional[Tuple[str, List[PairData], Dict[str, SecurityData]]]:
+        """
+        Lease the oldest cycle whose tasks have all finished, returning its id, pairs and security data.
+
+        The cycle stays in the queue until `finish_cycle` is called after it was published, so a publisher that fails
+        or dies hands it over to the next attempt once the lease expires. A cycle that could not be published in
+        `max_attempts` attempts is dropped.
+        """
+
+        now = time()
+        with self._transaction() as connection:
+            expired = [cycle for cycle, in connection.execute(
+                "SELECT cycle FROM cycles WHERE publishing_until < ? AND attempts >= ?", (now, self.max_attempts)
+            )]
+            for cycle in expired:
+                print(f"Cycle {cycle} dropped after {self.max_attempts} failed publishing attempts")
+                connection.execute("DELETE FROM tasks WHERE cycle = ?", (cycle,))
+                connection.execute("DELETE FROM cycles WHERE cycle = ?", (cycle,))
+
+            row = connection.execute(
+                "SELECT cycle FROM cycles WHERE (publishing_until IS NULL OR publishing_until < ?) AND NOT EXISTS ("
+                "SELECT 1 FROM tasks WHERE tasks.cycle = cycles.cycle AND status IN ('pending', 'leased')"
+                ") ORDER BY created LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            cycle, = row
+            connection.execute("UPDATE cycles SET publishing_until = ?, attempts = attempts + 1 WHERE cycle = ?",
+                               (now + self.lease_seconds, cycle))
+            tasks = connection.execute(
+                "SELECT kind, payload, status, result FROM tasks WHERE cycle = ? ORDER BY id", (cycle,)
+            ).fetchall()
+
+        pairs: Dict[str, PairData] = {}
+        securities: Dict[str, SecurityData] = {}
+        for kind, payload, status, result in tasks:
+            if kind == "pairs" and status == "done":
+                pairs.update((pair["address"], pair_from_dict(pair)) for pair in loads(result))
+            elif kind == "security":
+                address = loads(payload)["address"]
+                securities[address] = (SecurityData(**loads(result)) if status == "done"
+                                       else SecurityData(c={}, h={}, m={}, n={}, error=loads(result)["error"]))
+
+        return cycle, list(pairs.values()), securities
+
+    def finish_cycle(self, cycle: str):
+        """Delete a published cycle and its tasks, so the queue file does not grow with every cycle."""
+
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM tasks WHERE cycle = ?", (cycle,))
+            connection.execute("DELETE FROM cycles WHERE cycle = ?", (cycle,))
+
+    def release_cycle(self, cycle: str):
+        """Hand a cycle whose publishing failed back for another attempt without waiting for its lease."""
+
+        with self._transaction() as connection:
+            connection.execute("UPDATE cycles SET publishing_until = ? WHERE cycle = ?", (time(), cycle))
+
+
+def run_worker(queue_path: str, idle_sleep: float = 5):
+    """Pull and execute listing and security tasks until the process is stopped."""
+
+    queue, name = WorkQueue(queue_path), worker_name()
+    print(f"Worker {name} started")
+
+    with create_data_source(getenv("DATA_SOURCE", "selenium"), getenv("BIRDEYE_API_KEY")) as source:
+        while True:
+            if (task := queue.claim(name)) is None:
+                sleep(idle_sleep)
+                continue
+
+            task_id, cycle, kind, payload = task
+            try:
+                if kind == "pairs":
+                    pairs = [pair_to_dict(pair) for pair in source.fetch_pairs(payload["page"])]
+                    queue.complete(task_id, name, pairs, [("security", pair) for pair in pairs])
+                elif kind == "security":
+                    pair = pair_from_dict(payload)
+                    security = source.check_security([pair])[pair.address]
+                    queue.complete(task_id, name, asdict(security))
+            except Exception as e:
+                print(f"Error executing {kind} task {task_id} of cycle {cycle}: {e}")
+                queue.fail(task_id, name, str(e))
+
+
+def run_coordinator(queue: WorkQueue, pages: int, interval: float):
+    """Start a new cycle every `interval` seconds."""
+
+    while True:
+        try:
+            cycle = queue.start_cycle(pages)
+            print(f"Cycle {cycle} queued with {pages} listing pages")
+        except Exception as e:
+            print(f"Error queueing a cycle: {e}")
+        sleep(interval)
+
+
+def run_publisher(queue: WorkQueue, publish: Publisher, lease_ttl: float = 60, poll_interval: float = 5):
+    """Post finished cycles while holding the publisher lease, so exactly one process posts to the channel."""
+
+    name = worker_name()
+    while True:
+        try:
+            if queue.acquire_lease("publisher", name, lease_ttl):
+                while (finished := queue.claim_finished_cycle()) is not None:
+                    cycle, pairs, securities = finished
+                    try:
+                        publish(pairs, securities)
+                    except Exception:
+                        queue.release_cycle(cycle)
+                        raise
+                    queue.finish_cycle(cycle)
+        except Exception as e:
+            print(f"Error publishing finished cycles: {e}")
+        sleep(poll_interval)
+
+
+def start_workers(queue_path: str, count: int) -> List[Process]:
+    """Start local worker processes; more can be started on the same host with `python distributed.py`."""
+
+    context = get_context("spawn")
+    workers = [context.Process(target=run_worker, args=(queue_path,), daemon=True) for _ in range(count)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+if __name__ == "__main__":
+    """Run a standalone worker against the shared queue."""
+
+    load_dotenv(dotenv_path=Path(r"..\..\.env"))
+    run_worker(getenv("WORK_QUEUE_PATH", "data/work_queue.sqlite"))
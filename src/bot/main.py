@@ -1,19 +1,31 @@
+from collections import OrderedDict
 from dataclasses import replace
+from functools import cache
+from multiprocessing import get_context
 from os import getenv
 from pathlib import Path
+from queue import Queue as ThreadQueue
 from threading import Thread
-from time import sleep
+from time import sleep, monotonic
+from typing import Set, Dict, Iterable, List
 
+from aiohttp import ClientError
 from dotenv import load_dotenv
-from selenium.webdriver.common.by import By
-from seleniumbase import SB
 from telebot import TeleBot
+from telebot.types import Update
 
-from birdeye import check_security_risks, should_post_token
+from alerts import AlertManager, RateLimitedSender, parse_alert_conditions
+from birdeye import should_post_token
+from browser import profile_from_env
+from data_sources import DataSource, SeleniumDataSource, create_data_source
+from dexscreener import ListingWatcher
+from distributed import WorkQueue, run_coordinator, run_publisher, start_workers
 from gemini.assistant import CryptoAIProcessor
-from models import PairData
-from utils import (transform_token, string_to_number, as_number, get_solana_address, to_minutes,
-                   wait_for_url_change, calculate_token_score, format_telegram_message, handle_command)
+from models import PairData, SecurityData
+from profiling import Profiler
+from trends import format_trends
+from webhook import run_webhook_server
+from utils import calculate_token_score, format_telegram_message, format_digest_messages, handle_command
 
 dotenv_path = Path(r"..\..\.env")
 load_dotenv(dotenv_path=dotenv_path)
@@ -21,116 +33,342 @@
 channel_id = getenv("CHANNEL_ID")
 user_data_dir = getenv("USER_DATA_DIR")
 gemini_api_key = getenv("GEMINI_API_KEY")
+stream_replies = getenv("STREAM_REPLIES", "0") == "1"
+stream_edit_interval = float(getenv("STREAM_EDIT_INTERVAL", "1.5"))
+digest_mode = getenv("DIGEST_MODE", "0") == "1"
+data_source_name = getenv("DATA_SOURCE", "selenium")
+birdeye_api_key = getenv("BIRDEYE_API_KEY")
+distributed_mode = getenv("DISTRIBUTED", "0") == "1"
+work_queue_path = getenv("WORK_QUEUE_PATH", "data/work_queue.sqlite")
+scrape_workers = int(getenv("SCRAPE_WORKERS", "2"))
+scrape_pages = int(getenv("SCRAPE_PAGES", "1"))
+webhook_url = getenv("WEBHOOK_URL")
+webhook_secret = getenv("WEBHOOK_SECRET")
+webhook_host = getenv("WEBHOOK_HOST", "127.0.0.1")
+webhook_port = int(getenv("WEBHOOK_PORT", "8443"))
+webhook_workers = int(getenv("WEBHOOK_WORKERS", "2"))
+live_mode = getenv("LIVE_MODE", "0") == "1"
+live_poll_interval = float(getenv("LIVE_POLL_INTERVAL", "5"))
+admin_ids = {int(admin_id) for admin_id in getenv("ADMIN_IDS", "").split(",") if admin_id.strip()}
 bot = TeleBot(BOT_TOKEN)
+alert_manager = AlertManager("data/alerts.sqlite")
+alert_sender = RateLimitedSender(lambda chat_id, text: bot.send_message(chat_id, text))
+profiler = Profiler(getenv("PROFILE_DIR", "profiles"))
+profiler.arm("cycle", int(getenv("PROFILE_CYCLES", "0")))
+profiler.arm("message", int(getenv("PROFILE_MESSAGES", "0")))
+digest_details: OrderedDict[str, PairData] = OrderedDict()
 crypto_ai = CryptoAIProcessor(
     model_name="models/gemini-2.0-flash-thinking-exp-01-21",
     api_key=gemini_api_key,
-    database_path="data/crypto_pairs.csv"
+    database_path="data/crypto_pairs.csv",
+    retention_days=float(getenv("HISTORY_RETENTION_DAYS", "30")),
 )
-MAX_ON_PAGE = 100
 
 
-def scrape_dexscreener_data(sb, url="https://dexscreener.com/solana?rankBy=pairAge&order=asc&minLiq=2000&minAge=3"):
-    """Scrape data from Dexscreener using SeleniumBase"""
+@cache
+def bot_username() -> str:
+    return bot.get_me().username
 
-    sb.driver.get(url)
-    wait_for_url_change(sb, "solana", timeout=10)
 
-    pairs_data = set()
-    for i in range(MAX_ON_PAGE):
-        if i == 3:
-            break
-        print(f"Processing pair {i + 1} of {MAX_ON_PAGE}")
-        try:
-            pair = sb.find_elements("a.ds-dex-table-row")[i]
-            columns = pair.find_elements(By.CSS_SELECTOR, "div.ds-table-data-cell")
+def post_pairs(pairs_data: Iterable[PairData], securities: Dict[str, SecurityData], details_limit: int = 1000):
+    """
+    Score checked pairs and post the qualifying ones to the channel.
+
+    In digest mode, the full messages of the latest `details_limit` digest tokens are kept, and every digest entry
+    links to them through a bot deep link (`/start <address>`), so the details are only rendered when asked for.
+    """
 
-            if not columns or len(columns) < 13:
+    digest = []
+    for pair_data in pairs_data:
+        security_data = securities[pair_data.address]
+        score = calculate_token_score(security_data)
+        pair_data = replace(pair_data, security=replace(security_data, score=score))
+
+        if should_post_token(pair_data.security):
+            if digest_mode:
+                digest.append(pair_data)
+                digest_details[pair_data.address] = pair_data
+                digest_details.move_to_end(pair_data.address)
+                while len(digest_details) > details_limit:
+                    digest_details.popitem(last=False)
                 continue
+            msg = format_telegram_message(pair_data)
+            bot.send_message(channel_id, msg, parse_mode="HTML")
+
+    details_url = f"https://t.me/{bot_username()}?start={{address}}" if digest else None
+    for msg in format_digest_messages(digest, details_url=details_url):
+        bot.send_message(channel_id, msg, parse_mode="HTML", disable_web_page_preview=True)
+
+
+def notify_alerts(pairs_data: Iterable[PairData]):
+    """Send the alerts of all subscriptions that the new pair data triggered, one message per chat."""
+
+    for chat_id, alerts in alert_manager.match(pairs_data).items():
+        alert_sender.submit(chat_id, "\n".join(alerts))
 
-            token, description = transform_token(columns[0].text)
-            pair_data = PairData(
-                token=token,
-                description=description,
-                address=get_solana_address(pair.get_attribute("href")),
-                price=string_to_number(columns[1].text),
-                age=to_minutes(columns[2].text),
-                buys=as_number(columns[3].text),
-                sells=as_number(columns[4].text),
-                volume=string_to_number(columns[5].text),
-                makers=as_number(columns[6].text),
-                five_min_change=string_to_number(columns[7].text) if len(columns[7].text) > 1 else None,
-                one_hour_change=string_to_number(columns[8].text) if len(columns[8].text) > 1 else None,
-                six_hour_change=string_to_number(columns[9].text) if len(columns[9].text) > 1 else None,
-                twenty_four_hour_change=string_to_number(columns[10].text) if len(columns[10].text) > 1 else None,
-                liquidity=string_to_number(columns[11].text),
-                market_cap=string_to_number(columns[12].text),
-            )
-            pairs_data.add(pair_data)
-        except (ValueError, IndexError) as e:
-            print(f"Error processing pair: {e}")
-            continue
-
-    return pairs_data
+
+def run_cycle(source: DataSource, pairs_data: Set[PairData]):
+    """Save freshly scraped pairs, check their security and post the qualifying ones."""
+
+    crypto_ai.save_pair_data(pairs_data)
+    notify_alerts(pairs_data)
+    post_pairs(pairs_data, source.check_security(pairs_data))
+
+
+def publish_cycle(pairs_data: List[PairData], securities: Dict[str, SecurityData]):
+    """Save and post a cycle that was scraped by distributed workers."""
+
+    with profiler.section("cycle"):
+        crypto_ai.save_pair_data(set(pairs_data))
+        notify_alerts(pairs_data)
+        post_pairs(pairs_data, securities)
+        crypto_ai.compact_history()
 
 
 def main():
     """Main function to run the bot."""
 
-    with SB(uc=True, headless=False) as sb:
+    with create_data_source(data_source_name, birdeye_api_key) as source:
         try:
-            pairs_data = scrape_dexscreener_data(sb)
+            pairs_data = source.fetch_pairs()
+        except (ClientError, TimeoutError, ValueError, KeyError) as e:
+            print(f"Data source failed: {e}. Falling back to the browser scraper...")
+            with SeleniumDataSource() as fallback_source:
+                run_cycle(fallback_source, fallback_source.fetch_pairs())
+            return
+
+        run_cycle(source, pairs_data)
+
+
+@bot.message_handler(commands=["profile"], func=lambda message: message.from_user.id in admin_ids)
+def handle_profile_command(message):
+    """Arm the profiler for the next runs of a section: /profile <cycle|message> [runs]"""
+    args = message.text.split()[1:]
+    if not args or args[0] not in ("cycle", "message") or not all(arg.isdigit() for arg in args[1:2]):
+        bot.send_message(message.chat.id, "Usage: /profile <cycle|message> [runs]")
+        return
+    if args[0] == "message" and webhook_url:
+        bot.send_message(message.chat.id, "Chat messages are handled by the webhook worker processes, which this "
+                                          "command cannot reach. Set PROFILE_MESSAGES to profile the first messages "
+                                          "of every worker instead.")
+        return
+
+    runs = int(args[1]) if len(args) > 1 else 1
+    profiler.arm(args[0], runs)
+    bot.send_message(message.chat.id, f"Profiling the next {runs} {args[0]} run(s) into {profiler.output_dir}/")
+
+
+@bot.message_handler(commands=["profile"])
+def handle_profile_command_denied(message):
+    """Refuse /profile to users who are not admins, instead of passing it on to the assistant."""
+    bot.send_message(message.chat.id, "You are not allowed to use this command.")
+
+
+@bot.message_handler(commands=["alert"])
+def handle_alert_command(message):
+    """Subscribe to alerts: /alert <coin> <metric> <op> <value> [or <metric> <op> <value> ...]"""
+    parts = message.text.split(maxsplit=2)
+    if len(parts) < 3:
+        bot.send_message(message.chat.id, "Usage: /alert BONK/SOL liquidity > 50K or 1h < -20%")
+        return
+
+    if not (candidates := crypto_ai.search_index.search(parts[1], limit=1)):
+        bot.send_message(message.chat.id, f"I couldn't find {parts[1]} among the scraped coins.")
+        return
+
+    try:
+        conditions = parse_alert_conditions(parts[2])
+    except ValueError as e:
+        bot.send_message(message.chat.id, str(e))
+        return
+
+    coin = candidates[0][1]
+    rules = alert_manager.subscribe(message.chat.id, coin["address"], coin["token"], conditions)
+    bot.send_message(message.chat.id, "Alert set:\n" + "\n".join(rule.describe() for rule in rules))
+
 
-            crypto_ai.save_pair_data(pairs_data)
+@bot.message_handler(commands=["alerts", "unalert"])
+def handle_alerts_command(message):
+    """List alerts with /alerts, remove one with /unalert <id>"""
+    command, *args = message.text[1:].split()
+    if command.split("@")[0] == "unalert":
+        removed = bool(args) and args[0].lstrip("#").isdigit() and alert_manager.unsubscribe(
+            message.chat.id, int(args[0].lstrip("#")))
+        bot.send_message(message.chat.id, "Alert removed." if removed else "Usage: /unalert <id> (see /alerts)")
+        return
 
-            for pair_data in pairs_data:
-                security_data = check_security_risks(sb, pair_data.token)
-                score = calculate_token_score(security_data)
-                pair_data = replace(pair_data, security=replace(security_data, score=score))
+    rules = alert_manager.rules_of(message.chat.id)
+    bot.send_message(message.chat.id, "\n".join(rule.describe() for rule in rules) if rules else "No alerts set.")
 
-                if should_post_token(pair_data.security):
-                    msg = format_telegram_message(pair_data)
-                    bot.send_message(channel_id, msg, parse_mode="HTML")
-        finally:
-            pass
+
+@bot.message_handler(commands=["details"])
+@bot.message_handler(commands=["start"], func=lambda message: len(message.text.split()) > 1)
+def handle_details_command(message):
+    """Send the full message of a token from a recent digest: /details <address>, also opened by digest links."""
+    if len(parts := message.text.split()) < 2:
+        bot.send_message(message.chat.id, "Usage: /details <address>")
+        return
+    if (pair_data := digest_details.get(parts[1])) is None:
+        bot.send_message(message.chat.id, "Details of this token are no longer available.")
+        return
+    bot.send_message(message.chat.id, format_telegram_message(pair_data), parse_mode="HTML")
 
 
 @bot.message_handler(commands=["start", "help", "info", "trends", "support"])
 def handle_commands(message):
     """Handle bot commands using AI assistant"""
-    command = message.text[1:]
-    response = handle_command(command)
+    command, *args = message.text[1:].split()
+    command = command.split("@")[0]
+    response = format_trends(crypto_ai.trends, *args[:1]) if command == "trends" else handle_command(command)
     bot.send_message(message.chat.id, response, parse_mode="HTML")
 
 
+def stream_reply(message, chunks, placeholder="…", failure="Sorry, I could not finish this reply."):
+    """
+    Reply with a placeholder and progressively edit it as chunks arrive, at most once per edit interval.
+
+    If the stream fails, the placeholder is replaced with the text received so far, or with `failure` if there is none.
+    """
+
+    reply, text, shown, last_edit = None, "", "", 0.
+    try:
+        for chunk in chunks:
+            text += chunk
+            if reply is None:
+                reply = bot.reply_to(message, placeholder)
+            if monotonic() - last_edit >= stream_edit_interval and text.strip() and text != shown:
+                bot.edit_message_text(text + placeholder, message.chat.id, reply.message_id)
+                shown, last_edit = text, monotonic()
+    except Exception as e:
+        print(f"Error streaming reply: {e}")
+        if reply is None:
+            bot.reply_to(message, failure)
+            return
+        text = text if text.strip() else failure
+
+    if reply is not None and text.strip():
+        bot.edit_message_text(text, message.chat.id, reply.message_id)
+
+
 @bot.message_handler()
 def handle_messages(message):
     """Handle messages with two-stage processing"""
-    technical_output, user_response = crypto_ai.process_message(message.text)
+    with profiler.section("message"):
+        if stream_replies:
+            technical_output, user_chunks = crypto_ai.process_message_stream(message.text)
+            stream_reply(message, user_chunks)
+            return
 
-    if user_response:
-        bot.reply_to(message, user_response)
+        technical_output, user_response = crypto_ai.process_message(message.text)
+
+        if user_response:
+            bot.reply_to(message, user_response)
 
 
 def main_loop():
     while True:
         print("Running scraping and posting cycle...")
-        main()
+        with profiler.section("cycle"):
+            main()
+            crypto_ai.compact_history()
         print("Scraping cycle finished. Waiting for next run...")
         sleep(30 * 60)
 
 
+def live_loop():
+    """
+    Keep the listing open and process new pairs within seconds of their appearance, instead of reloading every cycle.
+
+    The page is drained every `LIVE_POLL_INTERVAL` seconds, and the history is compacted at the usual 30 minute pace.
+    When the browser or a cycle fails, the error is logged and the watcher is restarted in a new browser, picking up
+    the pairs that appeared in the meantime.
+    """
+
+    browser_profile = profile_from_env()
+    watcher = ListingWatcher(profile=browser_profile, reload_interval=max(1, int(30 * 60 / live_poll_interval)))
+    last_compaction = monotonic()
+    while True:
+        try:
+            with SeleniumDataSource(browser_profile) as source:
+                pairs_data = watcher.start(source.sb)
+                print("Watching the listing for new pairs...")
+                while True:
+                    if pairs_data:
+                        print(f"Detected {len(pairs_data)} new pairs.")
+                        with profiler.section("cycle"):
+                            run_cycle(source, pairs_data)
+                    if monotonic() - last_compaction >= 30 * 60:
+                        crypto_ai.compact_history()
+                        last_compaction = monotonic()
+                    sleep(live_poll_interval)
+                    pairs_data = watcher.drain()
+        except Exception as e:
+            print(f"Live mode failed: {e}. Restarting the listing watcher...")
+            sleep(live_poll_interval)
+
+
+def webhook_worker(updates):
+    """Process raw webhook updates from a queue until a `None` sentinel is received."""
+
+    while (update := updates.get()) is not None:
+        try:
+            bot.process_new_updates([Update.de_json(update)])
+        except Exception as e:
+            print(f"Error processing update: {e}")
+
+
+def run_webhook():
+    """
+    Receive updates through a local webhook server and dispatch chat messages to worker processes.
+
+    Commands are handled by a thread of this process, as they use its trends, alerts and profiler state. Workers are
+    spawned rather than forked, so they do not inherit locks held by the threads already running here.
+    """
+
+    context = get_context("spawn")
+    queues = [context.Queue() for _ in range(webhook_workers)]
+    workers = [context.Process(target=webhook_worker, args=(updates,), daemon=True) for updates in queues]
+    for worker in workers:
+        worker.start()
+    command_queue = ThreadQueue()
+    Thread(target=webhook_worker, args=(command_queue,), daemon=True).start()
+
+    bot.remove_webhook()
+    bot.set_webhook(url=webhook_url, secret_token=webhook_secret)
+    try:
+        run_webhook_server(webhook_host, webhook_port, webhook_secret, queues, command_queue=command_queue)
+    finally:
+        bot.remove_webhook()
+        command_queue.put(None)
+        for updates in queues:
+            updates.put(None)
+        for worker in workers:
+            worker.join(timeout=5)
+
+
 if __name__ == "__main__":
     """Run the bot."""
 
     print("Starting scraping and posting bot...")
 
-    channel_thread = Thread(target=main_loop, daemon=True)
-    channel_thread.start()
+    if webhook_url and not webhook_secret:
+        raise ValueError("WEBHOOK_SECRET must be set to run in webhook mode")
+
+    if distributed_mode:
+        work_queue = WorkQueue(work_queue_path)
+        start_workers(work_queue_path, scrape_workers)
+        Thread(target=run_coordinator, args=(work_queue, scrape_pages, 30 * 60), daemon=True).start()
+        Thread(target=run_publisher, args=(work_queue, publish_cycle), daemon=True).start()
+    else:
+        channel_thread = Thread(target=live_loop if live_mode else main_loop, daemon=True)
+        channel_thread.start()
 
     print("Bot is running in the background. Press Ctrl+C to stop.")
     try:
-        bot.polling(none_stop=True)
+        if webhook_url:
+            run_webhook()
+        else:
+            bot.polling(none_stop=True)
     except KeyboardInterrupt:
         print("Stopping bot...")
         bot.stop_polling()
@@ -70,7 +70,7 @@ class PairData:
     buys: int
     sells: int
     volume: float
-    makers: int
+    makers: Optional[int]
     five_min_change: Optional[float]
     one_hour_change: Optional[float]
     six_hour_change: Optional[float]
@@ -0,0 +1,99 @@
+from cProfile import Profile
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from sys import _current_frames
+from threading import Thread, Event, Lock, get_ident
+from typing import Dict
+
+
+class StackSampler:
+    """Samples the call stack of one thread at a fixed interval and counts identical stacks."""
+
+    def __init__(self, thread_id: int, interval: float = .005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = _current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f"{Path(frame.f_code.co_filename).name}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def write_collapsed(self, path: Path):
+        """Write the samples in the collapsed stack format used by flamegraph tools."""
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+class Profiler:
+    """
+    Profiles the next N runs of a named section (e.g. "cycle" or "message") on demand.
+
+    An armed run is wrapped in both a deterministic profiler and a stack sampler, and writes a timestamped `.prof` file
+    (readable with `pstats` or snakeviz) and a `.collapsed` flamegraph file to `output_dir`. When nothing is armed, a
+    section costs a single dictionary lookup.
+    """
+
+    def __init__(self, output_dir: str = "profiles", sample_interval: float = .005):
+        self.output_dir = Path(output_dir)
+        self.sample_interval = sample_interval
+        self.remaining: Dict[str, int] = {}
+        self.lock = Lock()
+
+    def arm(self, section: str, runs: int = 1):
+        """Profile the next `runs` runs of a section."""
+
+        with self.lock:
+            self.remaining[section] = runs
+
+    def _take(self, section: str) -> bool:
+        with self.lock:
+            if self.remaining.get(section, 0) <= 0:
+                return False
+            self.remaining[section] -= 1
+            return True
+
+    @contextmanager
+    def section(self, name: str):
+        if not self.remaining.get(name) or not self._take(name):
+            yield
+            return
+
+        profile = Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            profile = None
+
+        sampler = StackSampler(get_ident(), self.sample_interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            if profile is not None:
+                profile.disable()
+
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            path = self.output_dir / f"{name}-{datetime.now():%Y%m%d-%H%M%S-%f}"
+            if profile is not None:
+                profile.dump_stats(path.with_suffix(".prof"))
+            sampler.write_collapsed(path.with_suffix(".collapsed"))
+            print(f"Profile of {name} written to {path}.*")
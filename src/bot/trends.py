@@ -0,0 +1,130 @@
+from collections import defaultdict, deque, OrderedDict
+from html import escape
+from heapq import heappush, heappop, heapify
+from threading import Lock
+from time import time
+from typing import Dict, Deque, Iterable, List, Optional, Tuple
+
+from models import PairData
+from utils import number_to_string
+
+TREND_METRICS = {
+    "volume": ("📊 Top Volume", lambda value: f"${number_to_string(value)}"),
+    "one_hour_change": ("🚀 Top 1h Change", lambda value: f"{value:.2f}%"),
+    "liquidity_growth": ("💧 Liquidity Growth",
+                         lambda value: f"{"+" if value >= 0 else "-"}${number_to_string(abs(value))}"),
+    "new_makers": ("👥 New Makers", lambda value: f"{value:+.0f}"),
+}
+
+GROWTH_METRICS = {"liquidity_growth", "new_makers"}
+
+
+class TrendAggregator:
+    """
+    Rolling per-window aggregates with top-N heaps, maintained incrementally as pair snapshots are saved.
+
+    Every (window, metric) keeps the current value per address plus a max-heap of (value, address) entries. Heaps are
+    append-only, outdated entries are skipped (and dropped) lazily when the top is read and the heaps are rebuilt once
+    they outgrow the live values, so both updates and queries stay cheap no matter how much history has been saved.
+    """
+
+    def __init__(self, windows: Optional[Dict[str, int]] = None, top_n: int = 5):
+        self.windows = windows or {"1h": 60 * 60, "24h": 24 * 60 * 60}
+        self.top_n = top_n
+        self.history: Dict[str, Deque[Tuple[float, PairData]]] = defaultdict(deque)
+        self.last_seen: OrderedDict[str, float] = OrderedDict()
+        self.values: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(dict)
+        self.heaps: Dict[Tuple[str, str], List[Tuple[float, str]]] = defaultdict(list)
+        self.lock = Lock()
+
+    @staticmethod
+    def _metrics(first: PairData, last: PairData) -> Dict[str, Optional[float]]:
+        return {
+            "volume": last.volume,
+            "one_hour_change": last.one_hour_change,
+            "liquidity_growth": last.liquidity - first.liquidity,
+            "new_makers": last.makers - first.makers if last.makers is not None and first.makers is not None else None,
+        }
+
+    def update(self, pairs: Iterable[PairData], now: Optional[float] = None):
+        """Fold a batch of pair snapshots into the rolling aggregates."""
+
+        now = time() if now is None else now
+        max_window = max(self.windows.values())
+
+        with self.lock:
+            while self.last_seen and now - next(iter(self.last_seen.values())) > max_window:
+                address, _ = self.last_seen.popitem(last=False)
+                del self.history[address]
+                for values in self.values.values():
+                    values.pop(address, None)
+
+            for pair in pairs:
+                history = self.history[pair.address]
+                history.append((now, pair))
+                self.last_seen[pair.address] = now
+                self.last_seen.move_to_end(pair.address)
+                while now - history[0][0] > max_window:
+                    history.popleft()
+
+                for window, seconds in self.windows.items():
+                    first = next(snapshot for timestamp, snapshot in history if now - timestamp <= seconds)
+                    for metric, value in self._metrics(first, pair).items():
+                        key = (window, metric)
+                        if value is None or metric in GROWTH_METRICS and value <= 0:
+                            self.values[key].pop(pair.address, None)
+                            continue
+                        self.values[key][pair.address] = value
+                        heappush(self.heaps[key], (-value, pair.address))
+
+            for key, heap in self.heaps.items():
+                if len(heap) > 4 * len(self.values[key]) + 64:
+                    heap[:] = [(-value, address) for address, value in self.values[key].items()]
+                    heapify(heap)
+
+    def top(self, window: str, metric: str, now: Optional[float] = None) -> List[Tuple[PairData, float]]:
+        """Return the top-N pairs seen within the window, ranked by the metric."""
+
+        now = time() if now is None else now
+        key, seconds = (window, metric), self.windows[window]
+
+        with self.lock:
+            heap, values = self.heaps[key], self.values[key]
+            result, valid = [], []
+            while heap and len(result) < self.top_n:
+                negative_value, address = heappop(heap)
+                if values.get(address) != -negative_value or any(address == entry[1] for entry in valid):
+                    continue
+                last_seen, pair = self.history[address][-1]
+                if now - last_seen > seconds:
+                    values.pop(address, None)
+                    continue
+                valid.append((negative_value, address))
+                result.append((pair, -negative_value))
+
+            for entry in valid:
+                heappush(heap, entry)
+
+        return result
+
+
+def format_trends(aggregator: TrendAggregator, window: Optional[str] = None) -> str:
+    """Format the current top movers of a window for a Telegram message."""
+
+    window = window if window in aggregator.windows else next(iter(aggregator.windows))
+
+    sections = []
+    for metric, (title, format_value) in TREND_METRICS.items():
+        top = aggregator.top(window, metric)
+        if not top:
+            continue
+        lines = [f"<b>{title}:</b>"]
+        lines.extend(f"{place}. <a href=\"https://dexscreener.com/solana/{escape(pair.address)}\">{escape(pair.token)}</a>: "
+                     f"{format_value(value)}"
+                     for place, (pair, value) in enumerate(top, start=1))
+        sections.append("\n".join(lines))
+
+    if not sections:
+        return f"No trends yet for the last {window}. Check back after the next scraping cycle! 📊"
+
+    return f"🔥 <b>Trending in the last {window}</b> 🔥\n\n" + "\n\n".join(sections)
@@ -1,6 +1,7 @@
+from html import escape
 from re import search, DOTALL
-from time import time
-from typing import Optional, Tuple
+from time import time, monotonic
+from typing import Optional, Tuple, Iterable, List
 
 from bot.models import Multiplier
 from models import PairData, SecurityData, RiskLevel, TimeFrame
@@ -131,8 +132,30 @@ def wait_for_url_change(sb, keyword, timeout, wait_time=.5, error_type="print",
             break
 
 
-def calculate_token_score(security_data: SecurityData) -> float:
-    """Calculate token security score based on various factors."""
+class Deadline:
+    """A time budget shared by a sequence of waits, so their timeouts cannot stack up beyond it."""
+
+    def __init__(self, seconds: float):
+        self.expires = monotonic() + seconds
+
+    def left(self) -> float:
+        """Seconds left in the budget, zero once it is spent."""
+
+        return max(.0, self.expires - monotonic())
+
+    def timeout(self, cap: float) -> float:
+        """The timeout for the next wait: at most `cap`, never beyond the deadline."""
+
+        if (left := self.left()) <= 0:
+            raise TimeoutError("Deadline exceeded")
+        return min(cap, left)
+
+
+def calculate_token_score(security_data: SecurityData) -> Optional[float]:
+    """Calculate token security score based on various factors. Failed checks are left unscored (None)."""
+
+    if security_data.error is not None:
+        return None
 
     max_score = 0
     for risk_scoring in SCORING_CONFIG:
@@ -151,41 +174,18 @@ def calculate_token_score(security_data: SecurityData) -> float:
     return max(0, min(100, score / max_score * 100))
 
 
-def format_telegram_message(data: PairData, threshold=98):
-    """Format data for a Telegram message with security score."""
+TELEGRAM_MESSAGE_LIMIT = 4096
 
-    security_info, score_text = "", ""
-
-    if data.security:
-        score_emoji = "🟢" if data.security.score >= threshold else "🔴"
-        score_text = f"{score_emoji} {data.security.score:.2f}%"
-
-        for risk_level in RiskLevel:
-            if severity_data := getattr(data.security, risk_level.value):
-                security_info += f"\n{risk_level.emoji} <b>{risk_level.label} Security Risks:</b> {risk_level.emoji}"
-                for issue, details in severity_data.items():
-                    for platform, description in details.items():
-                        if description:
-                            security_info += f"\n<u>{platform.capitalize()}</u> - {issue.capitalize()}: {description}"
-
-    def format_change(value):
-        return f"{number_to_string(value)}%" if value is not None else "-"
-
-    change_lines = [
-        f"🕛 <b>{time_frame.label} Change:</b> <i>{format_change(getattr(data, time_frame.attribute, None))}</i>"
-        for time_frame in TimeFrame
-    ]
-
-    return f"""
-🌱 <b>Token:</b> <a href="https://dexscreener.com/solana/{data.address}">{data.token}: {data.description}</a>
-💵 <b>Price:</b> ${number_to_string(data.price)}
-🕛 <b>Age:</b> {from_minutes(data.age)}
-🛒 <b>Sells:</b> {data.sells}
-📊 <b>Volume:</b> ${number_to_string(data.volume)}
-👥 <b>Makers:</b> {data.makers}
-{"\n".join(change_lines)}
-💧 <b>Liquidity:</b> ${number_to_string(data.liquidity)}
-💰 <b>Market Cap:</b> ${number_to_string(data.market_cap)}
+TOKEN_MESSAGE_TEMPLATE = """
+🌱 <b>Token:</b> <a href="https://dexscreener.com/solana/{address}">{token}: {description}</a>
+💵 <b>Price:</b> ${price}
+🕛 <b>Age:</b> {age}
+🛒 <b>Sells:</b> {sells}
+📊 <b>Volume:</b> ${volume}
+👥 <b>Makers:</b> {makers}
+{change_lines}
+💧 <b>Liquidity:</b> ${liquidity}
+💰 <b>Market Cap:</b> ${market_cap}
 
 📊 <b>Models Score:</b>
 Model 1: {score_text}
@@ -193,6 +193,108 @@ def format_change(value):
 {security_info}
 """
 
+CHANGE_LINE_TEMPLATE = "🕛 <b>{label} Change:</b> <i>{change}</i>"
+
+DIGEST_DETAILS_TEMPLATE = " · <a href=\"{url}\">🔎 Details</a>"
+
+DIGEST_HEADER_TEMPLATE = "📰 <b>New tokens digest</b> ({count})\n"
+
+DIGEST_ENTRY_TEMPLATE = ("🌱 <a href=\"https://dexscreener.com/solana/{address}\">{token}</a> {score_text}{details}\n"
+                         "💵 ${price} · 💧 ${liquidity} · 📊 ${volume} · 🕛 {age} · 1h {one_hour_change}")
+
+
+def format_change(value: Optional[float]) -> str:
+    """Format a price change percentage, or a dash if it is unknown."""
+
+    return f"{number_to_string(value)}%" if value is not None else "-"
+
+
+def format_score(security: Optional[SecurityData], threshold=98) -> str:
+    """Format a security score with its pass/fail emoji."""
+
+    if not security:
+        return ""
+    if security.score is None:
+        return "⚪ Unscored"
+    return f"{"🟢" if security.score >= threshold else "🔴"} {security.score:.2f}%"
+
+
+def format_security_info(security: SecurityData) -> str:
+    """Format the detailed per-platform security risks of a token."""
+
+    lines = []
+    for risk_level in RiskLevel:
+        if severity_data := getattr(security, risk_level.value):
+            lines.append(f"{risk_level.emoji} <b>{risk_level.label} Security Risks:</b> {risk_level.emoji}")
+            lines.extend(f"<u>{platform.capitalize()}</u> - {issue.capitalize()}: {description}"
+                         for issue, details in severity_data.items()
+                         for platform, description in details.items() if description)
+    return "".join(f"\n{line}" for line in lines)
+
+
+def format_telegram_message(data: PairData, threshold=98):
+    """Format data for a Telegram message with security score."""
+
+    return TOKEN_MESSAGE_TEMPLATE.format(
+        address=escape(data.address),
+        token=escape(data.token),
+        description=escape(data.description),
+        price=number_to_string(data.price),
+        age=from_minutes(data.age),
+        sells=data.sells,
+        volume=number_to_string(data.volume),
+        makers=data.makers if data.makers is not None else "-",
+        change_lines="\n".join(
+            CHANGE_LINE_TEMPLATE.format(label=time_frame.label,
+                                        change=format_change(getattr(data, time_frame.attribute, None)))
+            for time_frame in TimeFrame
+        ),
+        liquidity=number_to_string(data.liquidity),
+        market_cap=number_to_string(data.market_cap),
+        score_text=format_score(data.security, threshold),
+        security_info=format_security_info(data.security) if data.security else "",
+    )
+
+
+def format_digest_entry(data: PairData, threshold=98, details_url: Optional[str] = None) -> str:
+    """
+    Format a compact two-line summary of a token for a digest message.
+
+    With `details_url` (a template with an `{address}` field), the entry links to the full message of the token.
+    """
+
+    return DIGEST_ENTRY_TEMPLATE.format(
+        address=escape(data.address),
+        token=escape(data.token),
+        score_text=format_score(data.security, threshold),
+        details=DIGEST_DETAILS_TEMPLATE.format(url=escape(details_url.format(address=data.address)))
+        if details_url else "",
+        price=number_to_string(data.price),
+        liquidity=number_to_string(data.liquidity),
+        volume=number_to_string(data.volume),
+        age=from_minutes(data.age),
+        one_hour_change=format_change(data.one_hour_change),
+    )
+
+
+def format_digest_messages(pairs: Iterable[PairData], limit=TELEGRAM_MESSAGE_LIMIT, threshold=98,
+                           details_url: Optional[str] = None) -> List[str]:
+    """Pack compact token summaries into as few messages as possible, each within the Telegram length limit."""
+
+    pairs = list(pairs)
+    header = DIGEST_HEADER_TEMPLATE.format(count=len(pairs))
+
+    messages, current = [], header
+    for entry in (format_digest_entry(pair, threshold, details_url)[:limit - len(header) - 1] for pair in pairs):
+        if len(current) + len(entry) + 1 > limit:
+            messages.append(current)
+            current = header
+        current += f"\n{entry}"
+
+    if current != header:
+        messages.append(current)
+    return messages
+
 
 def handle_command(command: str) -> str:
     commands = {
@@ -207,11 +309,14 @@ def handle_command(command: str) -> str:
   /start: Start the conversation
   /help: Show this help message
   /info: Get information about the bot
-  /trends: Show trending cryptocurrencies
+  /trends [1h|24h]: Show top movers over a rolling window
+  /alert &lt;coin&gt; &lt;metric&gt; &lt;op&gt; &lt;value&gt;: Get notified, e.g. /alert BONK/SOL liquidity &gt; 50K or 1h &lt; -20%
+  /alerts: List your alerts
+  /unalert &lt;id&gt;: Remove an alert
+  /details &lt;address&gt;: Show the full security details of a token from a recent digest
   /support: Get support or ask questions
 Just ask your question! 📊""",
         "info": "I'm here to provide real-time crypto information. What would you like to know?",
-        "trends": "Let me show you what's trending in the crypto world right now.",
         "support": "Need help? Just ask your question and I'll assist you!",
     }
     return commands.get(
@@ -0,0 +1,92 @@
+from hmac import compare_digest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import loads, JSONDecodeError
+from typing import List, Optional
+
+
+UPDATE_KEYS = ("message", "edited_message", "channel_post", "edited_channel_post", "callback_query")
+
+
+def is_valid_update(update) -> bool:
+    """Check that a decoded webhook body is an update object whose known parts are objects too."""
+
+    return isinstance(update, dict) and all(isinstance(update[key], dict) for key in UPDATE_KEYS if key in update)
+
+
+def chat_id_of(update: dict) -> Optional[int]:
+    """Extract the chat id of a raw Telegram update, if it has one."""
+
+    for key in UPDATE_KEYS[:-1]:
+        if key in update:
+            return (update[key].get("chat") or {}).get("id")
+    if "callback_query" in update:
+        return ((update["callback_query"].get("message") or {}).get("chat") or {}).get("id")
+    return None
+
+
+def is_command(update: dict) -> bool:
+    """Check whether a raw Telegram update is a bot command such as "/trends"."""
+
+    return str((update.get("message") or {}).get("text", "")).startswith("/")
+
+
+def make_webhook_handler(secret_token: str, queues: List, path: str = "/webhook", command_queue=None):
+    """
+    Build a request handler class that validates Telegram webhook calls and pushes their updates into work queues.
+
+    Updates are routed to a queue by chat id, so every message of a chat is handled by the same worker and keeps its
+    conversation state. Commands go to `command_queue` when given, so they can be served from the state of the main
+    process. The queues may be `multiprocessing.Queue` or plain `queue.Queue` objects.
+
+    Every call must carry `secret_token` in its `X-Telegram-Bot-Api-Secret-Token` header, so a secret is required.
+    """
+
+    if not secret_token:
+        raise ValueError("A secret token is required to validate webhook calls")
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != path:
+                self.send_response(404)
+                self.end_headers()
+                return
+
+            received_token = self.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if not compare_digest(received_token, secret_token):
+                self.send_response(403)
+                self.end_headers()
+                return
+
+            try:
+                update = loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            except (ValueError, JSONDecodeError):
+                update = None
+            if not is_valid_update(update):
+                self.send_response(400)
+                self.end_headers()
+                return
+
+            if command_queue is not None and is_command(update):
+                command_queue.put(update)
+            else:
+                queues[hash(chat_id_of(update)) % len(queues)].put(update)
+
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    return WebhookHandler
+
+
+def run_webhook_server(host: str, port: int, secret_token: str, queues: List, path: str = "/webhook",
+                       command_queue=None):
+    """Serve the webhook endpoint until interrupted."""
+
+    server = ThreadingHTTPServer((host, port), make_webhook_handler(secret_token, queues, path, command_queue))
+    print(f"Webhook server listening on http://{host}:{port}{path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -3,13 +3,18 @@
 from collections import deque
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Tuple, Set
+from threading import Lock
+from time import time
+from typing import Optional, Tuple, Set, Iterator
 
 import pandas as pd
 
 from bot.models import PairData
+from bot.trends import TrendAggregator
 from gemini.classifier_manager import ClassifierManager
 from gemini.custom_model import CustomModel
+from gemini.history import PAIR_FIELDNAMES, compact_pair_history, has_current_header
+from gemini.search_index import CoinSearchIndex
 from gemini.utils import translate_text
 
 
@@ -26,9 +31,18 @@ def __init__(
             api_key: str,
             database_path: str = "data/crypto_pairs.csv",
             classifier_model_path: Path = Path("models") / "classifier.pickle",
+            archive_dir: Path = Path("data") / "archive",
+            retention_days: float = 30,
     ):
         self.database_path = Path(database_path)
+        self.archive_dir = Path(archive_dir)
+        self.retention_days = retention_days
+        self.database_lock = Lock()
+        self.search_index = CoinSearchIndex()
+        self.search_index_loaded_at = .0
+        self._load_search_index()
         self.conversation = ConversationState()
+        self.trends = TrendAggregator()
         self.classifier_manager = ClassifierManager(classifier_model_path)
 
         technical_system_instruction = """
@@ -71,7 +85,7 @@ def __init__(
                 Use a friendly tone, as if you were talking to a friend.
                 Include an emoji if the user's message contained one.
                 Do not mention tags, technical processing details, or any model limitations.
-                Answer only based on the provided data, without additional research. If the coin is not found, mention this.
+                Answer only based on the provided data, without additional research. If the coin is not found, mention this, and name the closest match if one is given.
                 Make sure your answer is tailored to the user's language and remains strictly within these guidelines.
                 Examples:
                 Input:  Style: casual
@@ -86,29 +100,21 @@ def __init__(
         self.user_model = CustomModel(model_name, api_key, user_system_instruction)
 
     def save_pair_data(self, pair_data: Set[PairData]):
-        fieldnames = [
-            "token",
-            "description",
-            "address",
-            "price",
-            "age",
-            "volume",
-            "liquidity",
-            "market_cap",
-            "security_score",
-        ]
-
         if not self.database_path.parent.exists():
             self.database_path.parent.mkdir(parents=True)
 
-        mode = "a" if self.database_path.exists() else "w"
-        with open(self.database_path, mode, newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)  # type: ignore
-            if mode == "w":
-                writer.writeheader()
+        scraped_at = time()
+        with self.database_lock:
+            if self.database_path.exists() and not has_current_header(self.database_path):
+                compact_pair_history(self.database_path, self.archive_dir, self.retention_days)
+
+            mode = "a" if self.database_path.exists() else "w"
+            with open(self.database_path, mode, newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=PAIR_FIELDNAMES)  # type: ignore
+                if mode == "w":
+                    writer.writeheader()
 
-            for pair in pair_data:
-                writer.writerow(
+                rows = [
                     {
                         "token": pair.token,
                         "description": pair.description,
@@ -121,20 +127,44 @@ def save_pair_data(self, pair_data: Set[PairData]):
                         "security_score": pair.security.score
                         if pair.security
                         else None,
+                        "scraped_at": scraped_at,
                     }
-                )
+                    for pair in pair_data
+                ]
+                writer.writerows(rows)
+
+        self.search_index.add(rows)
+        self.search_index_loaded_at = self.database_path.stat().st_mtime
+        self.trends.update(pair_data)
+
+    def compact_history(self):
+        """Deduplicate the pair history into its latest snapshots and archive the older ones."""
+
+        if not self.database_path.exists():
+            return
 
-    def _get_coin_data(self, coin_name: str) -> Optional[dict]:
+        with self.database_lock:
+            hot_rows, archived_rows = compact_pair_history(self.database_path, self.archive_dir, self.retention_days)
+        print(f"Pair history compacted: {hot_rows} latest snapshots kept, {archived_rows} archived")
+        self._load_search_index()
+
+    def _load_search_index(self):
         try:
+            modified = self.database_path.stat().st_mtime
             df = pd.read_csv(self.database_path)
-            coin_data = df[df["token"].str.lower() == coin_name.lower()]
-            return (
-                coin_data.to_dict("records")[0] if not coin_data.empty else None
-            )
-        except (FileNotFoundError, IndexError):
-            return None
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            return
+        search_index = CoinSearchIndex()
+        search_index.add(df.drop_duplicates("address", keep="last").to_dict("records"))
+        self.search_index, self.search_index_loaded_at = search_index, modified
 
-    def process_message(self, message: str) -> Tuple[str, str]:
+    def _get_coin_data(self, coin_name: str) -> Tuple[Optional[dict], Optional[dict]]:
+        if self.database_path.exists() and self.database_path.stat().st_mtime > self.search_index_loaded_at:
+            self._load_search_index()
+
+        return self.search_index.resolve(coin_name)
+
+    def _prepare_message(self, message: str) -> Tuple[str, Optional[str]]:
         technical_response_parts = deque()
         translated_message = translate_text(message)
         print(f"Input message: {message}")
@@ -164,21 +194,41 @@ def process_message(self, message: str) -> Tuple[str, str]:
         print(f"Preprocessed message: {technical_output}")
 
         if not self.conversation.is_active and technical_output.startswith("<conversation/>"):
-            return technical_output, ""
+            return technical_output, None
 
         coin_regex = re.compile(r"<coin name=\"(?P<coin_name>.*?)\">")
         for match in coin_regex.finditer(technical_output):
-            if coin_data := self._get_coin_data(match.group("coin_name")):
+            coin_data, closest = self._get_coin_data(match.group("coin_name"))
+            if coin_data:
                 technical_output = technical_output.replace(match.group(0), str(coin_data))
+            elif closest:
+                technical_output = technical_output.replace(
+                    match.group(0), f"{match.group("coin_name")} not found (closest match: {closest["token"]})")
             else:
                 technical_output = technical_output.replace(match.group(0), f"{match.group("coin_name")} not found")
 
+        if not self.conversation.is_active or technical_output.startswith("<conversation/>"):
+            return technical_output, None
+
+        user_context = f"Processed message: {technical_output}"
+        return technical_output, f"Style: {"casual" if "!" in message or "?" in message else "formal"}\n{user_context}"
+
+    def process_message(self, message: str) -> Tuple[str, str]:
+        technical_output, user_prompt = self._prepare_message(message)
+
         user_response = ""
-        if self.conversation.is_active and not technical_output.startswith("<conversation/>"):
-            user_context = f"Processed message: {technical_output}"
-            user_response = self.user_model.generate_content(
-                f"Style: {"casual" if "!" in message or "?" in message else "formal"}\n{user_context}"
-            )
+        if user_prompt is not None:
+            user_response = self.user_model.generate_content(user_prompt)
             print(f"User response: {user_response}")
 
         return technical_output, user_response
+
+    def process_message_stream(self, message: str) -> Tuple[str, Iterator[str]]:
+        """Same as `process_message`, but the user response is returned as a lazy stream of text chunks."""
+
+        technical_output, user_prompt = self._prepare_message(message)
+
+        if user_prompt is None:
+            return technical_output, iter(())
+
+        return technical_output, self.user_model.generate_content_stream(user_prompt)
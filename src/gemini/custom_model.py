@@ -1,4 +1,5 @@
 from collections import deque
+from typing import Iterator
 
 from google.generativeai import configure, GenerativeModel
 
@@ -15,6 +16,22 @@ def generate_content(self, message: str) -> str:
         self.memory.append(f"User: {message}\nCryptoAssistant: {response_text}")
         return response_text
 
+    def generate_content_stream(self, message: str) -> Iterator[str]:
+        """Yield response text chunks as they arrive, storing the full text in memory once the stream ends."""
+
+        prompt = f"{self.memory_to_string()}User: {message}\nCryptoAssistant: "
+        chunks = []
+        for chunk in self.model.generate_content(prompt, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without parts (e.g. a bare finish reason or safety feedback) have no text
+                continue
+            if text:
+                chunks.append(text)
+                yield text
+        self.memory.append(f"User: {message}\nCryptoAssistant: {"".join(chunks)}")
+
     def clear_memory(self):
         self.memory.clear()
 
@@ -0,0 +1,92 @@
+from os import replace
+from pathlib import Path
+from time import time
+from typing import Optional, Tuple
+
+import pandas as pd
+
+PAIR_FIELDNAMES = [
+    "token",
+    "description",
+    "address",
+    "price",
+    "age",
+    "volume",
+    "liquidity",
+    "market_cap",
+    "security_score",
+    "scraped_at",
+]
+
+
+def has_current_header(database_path: Path) -> bool:
+    """Check whether the pair history file was written with the current set of columns."""
+
+    with open(database_path, encoding="utf-8") as f:
+        return f.readline().strip().split(",") == PAIR_FIELDNAMES
+
+
+def _write_atomically(frame: pd.DataFrame, path: Path):
+    temporary = path.with_name(f".{path.name}.tmp")
+    if path.suffix == ".parquet":
+        frame.to_parquet(temporary, index=False)
+    else:
+        frame.to_csv(temporary, index=False)
+    replace(temporary, path)
+
+
+def compact_pair_history(
+        database_path: Path,
+        archive_dir: Path,
+        retention_days: float = 30,
+        downsample: str = "1h",
+        now: Optional[float] = None,
+) -> Tuple[int, int]:
+    """
+    Compact the pair history file into a hot table and a columnar archive.
+
+    The hot table keeps only the latest snapshot per address and replaces the history file. Older snapshots go to one
+    Parquet segment per UTC day of `scraped_at` in `archive_dir`. The segment of a day is merged with the new snapshots
+    and downsampled to one snapshot per address and `downsample` period as a whole, so repeated compactions neither
+    keep extra snapshots nor add files. Snapshots older than `retention_days` are dropped, and so are segments whose
+    whole day is. Snapshots without `scraped_at` (from files written before it existed) are dated to the last write of
+    the history file, so they expire too. Files are written under a temporary name and swapped in with an atomic
+    rename, so concurrent readers see either the old or the new file, never a partial one.
+
+    Returns the number of hot rows and the number of snapshots archived in this run.
+    """
+
+    now = time() if now is None else now
+    cutoff = now - retention_days * 24 * 60 * 60
+
+    df = pd.read_csv(database_path).reindex(columns=PAIR_FIELDNAMES)
+    df["scraped_at"] = df["scraped_at"].fillna(database_path.stat().st_mtime)
+    df = df[df["scraped_at"] >= cutoff]
+
+    latest = ~df.duplicated("address", keep="last")
+    hot, history = df[latest], df[~latest]
+
+    if not history.empty:
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        days = pd.to_datetime(history["scraped_at"], unit="s").dt.strftime("%Y-%m-%d")
+        for day, snapshots in history.groupby(days):
+            segment = archive_dir / f"{database_path.stem}-{day}.parquet"
+            if segment.exists():
+                snapshots = pd.concat([pd.read_parquet(segment), snapshots], ignore_index=True)
+            period = pd.to_datetime(snapshots["scraped_at"], unit="s").dt.floor(downsample)
+            snapshots = (snapshots.assign(period=period).sort_values("scraped_at", kind="stable")
+                         .drop_duplicates(["address", "period"], keep="last").drop(columns="period"))
+            _write_atomically(snapshots[snapshots["scraped_at"] >= cutoff], segment)
+
+    _write_atomically(hot, database_path)
+
+    if archive_dir.exists():
+        for segment in archive_dir.glob(f"{database_path.stem}-*.parquet"):
+            try:
+                day_start = pd.Timestamp(segment.stem.removeprefix(f"{database_path.stem}-"), tz="UTC").timestamp()
+            except ValueError:
+                continue
+            if day_start + 24 * 60 * 60 < cutoff:
+                segment.unlink(missing_ok=True)
+
+    return len(hot), len(history)
@@ -0,0 +1,141 @@
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from threading import Lock
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Split a normalized string into its padded character trigrams."""
+
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def deletions(text: str) -> FrozenSet[str]:
+    """The string itself and every variant of it with one character deleted."""
+
+    return frozenset({text} | {text[:i] + text[i + 1:] for i in range(len(text))})
+
+
+def edit_distance(first: str, second: str) -> int:
+    """Levenshtein distance that also counts a swap of two adjacent characters as one edit."""
+
+    previous, current = None, list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = first[i - 1] != second[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[-1]
+
+
+class CoinSearchIndex:
+    """
+    An in-memory search index over token symbols, descriptions and addresses.
+
+    Symbols ("bonk" for "BONK/SOL") and descriptions are indexed by trigrams, and candidates are ranked by their
+    trigram (Jaccard) similarity, so another quote asset or the project name still find the coin. The quote asset is
+    left out, as nearly every pair shares it. Short symbols have too few trigrams to survive a typo, so symbols of up
+    to `short_symbol` characters are also indexed by their one-character deletions and scored by edit distance.
+    Addresses are kept sorted and match exactly or by a prefix of at least `min_address_prefix` characters. Updates
+    only touch the entries of the coin that changed; coins are never removed, so rebuild the index to drop them.
+    """
+
+    def __init__(self, short_symbol: int = 5, min_address_prefix: int = 8):
+        self.short_symbol = short_symbol
+        self.min_address_prefix = min_address_prefix
+        self.records: Dict[str, dict] = {}
+        self.fields: Dict[str, Dict[str, FrozenSet[str]]] = {}
+        self.postings: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+        self.symbols: Dict[str, str] = {}
+        self.short_postings: Dict[str, Set[str]] = defaultdict(set)
+        self.addresses: List[Tuple[str, str]] = []
+        self.lock = Lock()
+
+    @staticmethod
+    def _symbol(text: str) -> str:
+        return text.strip().lower().split("/")[0]
+
+    @staticmethod
+    def _text(value) -> str:
+        """A record field as text, treating missing values (None, or NaN from pandas) as empty."""
+
+        return "" if value is None or value != value else str(value)
+
+    def add(self, records: Iterable[dict]):
+        """Insert or replace coins, keyed by address."""
+
+        with self.lock:
+            for record in records:
+                address = record["address"]
+                for field, grams in self.fields.pop(address, {}).items():
+                    for gram in grams:
+                        self.postings[gram].discard((address, field))
+                for variant in deletions(self.symbols.pop(address, "")):
+                    self.short_postings[variant].discard(address)
+                if address not in self.records:
+                    insort(self.addresses, (address.lower(), address))
+
+                self.records[address] = record
+                values = {"symbol": self._symbol(self._text(record.get("token"))),
+                          "description": self._text(record.get("description")).lower()}
+                self.fields[address] = {field: trigrams(value) for field, value in values.items() if value}
+                for field, grams in self.fields[address].items():
+                    for gram in grams:
+                        self.postings[gram].add((address, field))
+                if 0 < len(symbol := values["symbol"]) <= self.short_symbol:
+                    self.symbols[address] = symbol
+                    for variant in deletions(symbol):
+                        self.short_postings[variant].add(address)
+
+    def search(self, query: str, limit: int = 5, min_score: float = .4) -> List[Tuple[float, dict]]:
+        """Return up to `limit` coins ranked by similarity to the query, best first."""
+
+        text = self._symbol(query)
+        if not text:
+            return []
+
+        with self.lock:
+            scores: Dict[str, float] = {}
+
+            query_grams = trigrams(text)
+            common = Counter(match for gram in query_grams for match in self.postings.get(gram, ()))
+            for (address, field), shared in common.items():
+                score = shared / (len(query_grams) + len(self.fields[address][field]) - shared)
+                scores[address] = max(score, scores.get(address, 0))
+
+            if 3 <= len(text) <= self.short_symbol + 1:
+                for address in {address for variant in deletions(text)
+                                for address in self.short_postings.get(variant, ())}:
+                    symbol = self.symbols[address]
+                    score = 1 - edit_distance(text, symbol) / max(len(text), len(symbol))
+                    scores[address] = max(score, scores.get(address, 0))
+
+            if len(text) >= self.min_address_prefix:
+                start = bisect_left(self.addresses, (text,))
+                for lowered, address in self.addresses[start:start + limit]:
+                    if not lowered.startswith(text):
+                        break
+                    scores[address] = 1 if lowered == text else .9
+
+            ranked = sorted(((score, address) for address, score in scores.items() if score >= min_score),
+                            reverse=True)[:limit]
+            return [(score, self.records[address]) for score, address in ranked]
+
+    def resolve(self, query: str) -> Tuple[Optional[dict], Optional[dict]]:
+        """
+        Return `(match, closest)` for a coin the user named. Only an exact symbol, an address (or address prefix) or
+        a short symbol one typo away is trusted as the match; any other candidate is returned as the closest one.
+        """
+
+        if not (candidates := self.search(query, limit=1)):
+            return None, None
+
+        record = candidates[0][1]
+        text, symbol = self._symbol(query), self._symbol(self._text(record.get("token")))
+        if (text == symbol or (len(text) >= self.min_address_prefix and record["address"].lower().startswith(text))
+                or (len(symbol) <= self.short_symbol and edit_distance(text, symbol) <= 1)):
+            return record, None
+        return None, record
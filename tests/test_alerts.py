@@ -0,0 +1,87 @@
+import sys
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+sys.path[:0] = [str(Path(__file__).parents[1] / "src"), str(Path(__file__).parents[1] / "src" / "bot")]
+
+from alerts import AlertIndex, AlertRule, parse_alert_conditions  # noqa: E402
+from models import PairData  # noqa: E402
+
+PAIR = PairData(token="BONK/SOL", description="", address="bonk", price=1.0, age=10, buys=0, sells=0, volume=0.,
+                makers=None, five_min_change=None, one_hour_change=None, six_hour_change=None,
+                twenty_four_hour_change=None, liquidity=0., market_cap=0.)
+
+
+def rule(rule_id: int, op: str, threshold: float) -> AlertRule:
+    return AlertRule(id=rule_id, chat_id=1, address="bonk", token="BONK/SOL", metric="price", op=op,
+                     threshold=threshold)
+
+
+class AlertIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = AlertIndex()
+
+    def fired(self, price: float) -> list:
+        fired, _ = self.index.match([replace(PAIR, price=price)])
+        return sorted(rule.id for rule, _ in fired)
+
+    def test_first_value_fires_rules_that_hold(self):
+        self.index.add(rule(1, ">", 5))
+        self.index.add(rule(2, ">", 20))
+        self.index.add(rule(3, "<", 5))
+        self.index.add(rule(4, "<", 20))
+        self.assertEqual(self.fired(10), [1, 4])
+
+    def test_value_equal_to_threshold_does_not_fire(self):
+        self.index.add(rule(1, ">", 10))
+        self.index.add(rule(2, "<", 10))
+        self.assertEqual(self.fired(10), [])
+        self.assertEqual(self.fired(10.5), [1])
+        self.assertEqual(self.fired(10), [])
+        self.assertEqual(self.fired(9.5), [2])
+
+    def test_rising_value_fires_crossed_thresholds_once(self):
+        self.index.add(rule(1, ">", 5))
+        self.index.add(rule(2, ">", 15))
+        self.index.add(rule(3, ">", 25))
+        self.assertEqual(self.fired(1), [])
+        self.assertEqual(self.fired(20), [1, 2])
+        self.assertEqual(self.fired(21), [])
+        self.assertEqual(self.fired(30), [3])
+
+    def test_falling_value_fires_below_rules_and_rearms_above_rules(self):
+        self.index.add(rule(1, ">", 10))
+        self.index.add(rule(2, "<", 10))
+        self.index.add(rule(3, "<", 5))
+        self.assertEqual(self.fired(20), [1])
+        self.assertEqual(self.fired(7), [2])
+        self.assertEqual(self.fired(1), [3])
+        self.assertEqual(self.fired(20), [1])
+
+    def test_rule_added_while_true_fires_at_next_match(self):
+        self.assertEqual(self.fired(20), [])
+        self.index.add(rule(1, ">", 10))
+        self.assertEqual(self.fired(20), [1])
+        self.assertEqual(self.fired(20), [])
+
+    def test_removed_rule_does_not_fire(self):
+        self.index.add(rule(1, ">", 10))
+        self.index.remove(rule(1, ">", 10))
+        self.assertEqual(self.fired(20), [])
+
+
+class ParseAlertConditionsTest(unittest.TestCase):
+    def test_parses_suffixes_and_signs(self):
+        self.assertEqual(parse_alert_conditions("liquidity > 50K or 1h < -20%"),
+                         [("liquidity", ">", 50_000), ("one_hour_change", "<", -20)])
+        self.assertEqual(parse_alert_conditions("price > $.5"), [("price", ">", .5)])
+
+    def test_rejects_values_without_digits(self):
+        for text in ("price > .", "price > $", "price > -K", "price > 1.2.3"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_alert_conditions(text)
+
+
+if __name__ == "__main__":
+    unittest.main()